@@ -8,22 +8,27 @@ router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+def user_from_token(token: Optional[str]):
+    """Resolves a bearer token to its user, or None if the token is missing or invalid."""
+    if not token:
+        return None
+    try:
+        payload = security.jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+    except security.JWTError:
+        return None
+    username: Optional[str] = payload.get("sub")
+    if username is None:
+        return None
+    token_data = schemas.TokenData(username=username)
+    return database.get_user(username=token_data.username)
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = security.jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
-        username: Optional[str] = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except security.JWTError:
-        raise credentials_exception
-    
-    user = database.get_user(username=token_data.username)
+    user = user_from_token(token)
     if user is None:
         raise credentials_exception
     return user
@@ -1,21 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect, status
 from pydantic import BaseModel
 from starlette.staticfiles import StaticFiles
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
-import json
 import copy
+from contextlib import asynccontextmanager
 from datetime import datetime, date
 from collections import Counter
 from pathlib import Path
 from typing import List, Optional
 
-from src.app import chatbot_logic
+from src.app import chatbot_logic, inference_pool, interaction_logger, progress_aggregates
 from src.app import audio_manager, support_pack_manager, report_manager
 from src.app import notification_manager, sharing_manager, consent_manager
 
-from src.model import nlp_utils
+from src.model import nlp_utils, model_loader, nlp_registry
 
 from . import auth
 
@@ -25,7 +26,16 @@ from src.app import data_manager
 
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # spaCy, the classifier, T5 and the dense index load off the request path.
+    model_loader.start_background()
+    yield
+    interaction_logger.logger.shutdown()
+    progress_aggregates.snapshot_all()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 ROOT_DIR = Path(__file__).resolve().parents[2]
@@ -156,6 +166,18 @@ class ConsentRequest(BaseModel):
 
 
 
+@app.get("/healthz")
+async def healthz():
+    return {**model_loader.status(), "nlp_pipelines": nlp_registry.memory_report(), "inference": inference_pool.pool.stats(), "interaction_log": interaction_logger.logger.stats()}
+
+
+@app.get("/readyz")
+async def readyz():
+    report = model_loader.status()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+
 @app.get("/", include_in_schema=False)
 async def read_root():
     index_file = _get_frontend_index()
@@ -167,19 +189,19 @@ async def read_root():
 
 @app.get("/categories")
 
-async def get_categories():
+async def get_categories(request: Request):
 
-    categories = set()
+    categories, etag = nlp_utils.category_listing()
 
-    for pictogram in nlp_utils.pictograms:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
 
-        if pictogram.get('keywords'):
+    if_none_match = request.headers.get("if-none-match", "")
 
-            for tag in pictogram.get('tags', []):
+    if any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(",")):
 
-                categories.add(tag)
+        return Response(status_code=304, headers=headers)
 
-    return sorted(list(categories))
+    return JSONResponse(categories, headers=headers)
 
 
 
@@ -217,16 +239,10 @@ async def get_pictogram(path: str):
 
 
 
-@app.post("/process")
-
-async def process_sentence_endpoint(sentence: Sentence, current_user: schemas.User = Depends(auth.get_current_active_user)):
-    start = datetime.now().timestamp()
-    chatbot_response = chatbot_logic.chatbot.process_sentence(current_user.username, sentence.text, current_user.role)
-    duration_ms = int((datetime.now().timestamp() - start) * 1000)
-
+def _log_process_interaction(username: str, text: str, chatbot_response: dict, duration_ms: int):
     data_manager.log_interaction(
-        current_user.username,
-        sentence.text,
+        username,
+        text,
         chatbot_response.get("processed_sentence"),
         intent=chatbot_response.get("intent"),
         emotion=chatbot_response.get("emotion"),
@@ -235,18 +251,95 @@ async def process_sentence_endpoint(sentence: Sentence, current_user: schemas.Us
         response_time_ms=duration_ms
     )
 
+
+@app.post("/process")
+
+async def process_sentence_endpoint(sentence: Sentence, current_user: schemas.User = Depends(auth.get_current_active_user)):
+    start = datetime.now().timestamp()
+    # Off the event loop, bounded by the inference pool; concurrent turns can share a generation batch.
+    # A user's turns run one at a time, since their game state is not thread-safe.
+    try:
+        chatbot_response = await inference_pool.pool.run(
+            chatbot_logic.chatbot.process_sentence, current_user.username, sentence.text, current_user.role,
+            serial_key=current_user.username
+        )
+    except inference_pool.InferenceTimeout:
+        chatbot_response = chatbot_logic.chatbot.fallback_response()
+    except model_loader.ComponentUnavailable as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    duration_ms = int((datetime.now().timestamp() - start) * 1000)
+
+    _log_process_interaction(current_user.username, sentence.text, chatbot_response, duration_ms)
+
     return {
         "sentence": sentence.text,
         **chatbot_response
     }
 
 
+@app.websocket("/ws/process")
+async def process_sentence_stream(websocket: WebSocket, token: str | None = None):
+    """Streaming /process: send {"text": ...}; receive 'text' and 'word' events, then 'done' with the full package."""
+    current_user = auth.user_from_token(token)
+    if current_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            text = (message or {}).get("text") or ""
+            start = datetime.now().timestamp()
+            # Each turn gets its own queue; a worker that outlives its turn
+            # (timeout) is cut off so its late events never reach the client.
+            events = asyncio.Queue()
+            turn = {"open": True}
+
+            def deliver(event, events=events, turn=turn):
+                if turn["open"]:
+                    events.put_nowait(event)
+
+            def on_event(event, deliver=deliver, turn=turn):
+                if turn["open"]:
+                    loop.call_soon_threadsafe(deliver, event)
+
+            task = asyncio.ensure_future(inference_pool.pool.run(
+                chatbot_logic.chatbot.process_sentence, current_user.username, text, current_user.role, on_event,
+                serial_key=current_user.username
+            ))
+            while not task.done() or not events.empty():
+                next_event = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({next_event, task}, return_when=asyncio.FIRST_COMPLETED)
+                if next_event in done:
+                    await websocket.send_json(next_event.result())
+                else:
+                    next_event.cancel()
+            turn["open"] = False
+            try:
+                chatbot_response = task.result()
+            except inference_pool.InferenceTimeout:
+                chatbot_response = chatbot_logic.chatbot.fallback_response()
+            except model_loader.ComponentUnavailable as exc:
+                await websocket.send_json({"type": "error", "detail": str(exc)})
+                continue
+            duration_ms = int((datetime.now().timestamp() - start) * 1000)
+            _log_process_interaction(current_user.username, text, chatbot_response, duration_ms)
+            await websocket.send_json({"type": "done", "sentence": text, **chatbot_response})
+    except WebSocketDisconnect:
+        return
+
+
 @app.post("/speech-to-text")
 async def speech_to_text(language: str = Form('es'), label: str | None = Form(None), file: UploadFile = File(...), current_user: schemas.User = Depends(auth.get_current_active_user)):
     if current_user.role in ["child", "student"]:
         consent_manager.ensure_consent(current_user.username)
     saved = audio_manager.save_uploaded_audio(current_user.username, file, label)
-    transcription = audio_manager.transcribe_audio(saved['stored_path'], language)
+    try:
+        transcription = await inference_pool.pool.run(audio_manager.transcribe_audio, saved['stored_path'], language)
+    except inference_pool.InferenceTimeout:
+        transcription = {'text': '', 'language': language, 'warnings': ['transcription_timeout']}
     response_meta = {k: v for k, v in saved.items() if k != 'stored_path'}
     consent_manager.log_audit('speech_to_text', current_user.username, metadata={'audio_id': saved['id']})
     return {"audio": response_meta, "transcription": transcription}
@@ -304,27 +397,19 @@ async def read_users_me(current_user: schemas.User = Depends(auth.get_current_ac
 
 async def get_progress(current_user: schemas.User = Depends(auth.get_current_active_user)):
 
-    if not os.path.exists(data_manager.LOG_FILE):
-
-        return {"analytics": {}, "logs": []}
-
-    with open(data_manager.LOG_FILE, 'r', encoding='utf-8') as f:
-
-        all_logs = [json.loads(line) for line in f]
-
     user_logs = []
 
     if current_user.role == 'student':
 
-        user_logs = [log for log in all_logs if log.get('username') == current_user.username]
+        user_logs = data_manager.interactions().query([current_user.username])
 
     elif current_user.role in ['parent', 'teacher', 'therapist'] and current_user.students:
 
-        user_logs = [log for log in all_logs if log.get('username') in current_user.students]
+        user_logs = data_manager.interactions().query(current_user.students)
 
     else:
 
-        user_logs = all_logs
+        user_logs = data_manager.interactions().query()
 
     if not user_logs:
 
@@ -655,23 +740,9 @@ async def activate_support_pack(pack_id: str, current_user: schemas.User = Depen
 
 async def get_notifications(current_user: schemas.User = Depends(auth.get_current_active_user)):
 
-    if not os.path.exists(data_manager.LOG_FILE):
-
-        return {"message": "No usage data available."}
-
     today = date.today()
 
-    today_logs = []
-
-    with open(data_manager.LOG_FILE, 'r', encoding='utf-8') as f:
-
-        for line in f:
-
-            log = json.loads(line)
-
-            if datetime.fromisoformat(log['timestamp']).date() == today:
-
-                today_logs.append(log)
+    today_logs = data_manager.interactions().query(start=today.isoformat(), end=datetime.combine(today, datetime.max.time()).isoformat())
 
     if not today_logs:
 
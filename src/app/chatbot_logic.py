@@ -1,17 +1,22 @@
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from src.model import nlp_utils, intent_classifier, emotion_classifier
-from src.app import data_manager, consent_manager
+from src.model import nlp_utils, intent_emotion_classifier, t5_model, model_loader, nlp_registry
+from src.model.cache_utils import LRUCache
+from src.app import data_manager, consent_manager, decoding_profiles
+from src.app.generation_scheduler import GenerationScheduler
 from unidecode import unidecode
-import spacy
 import random
+import threading
 import re
 from collections import Counter
 import os
 
-# Load the spaCy model
-nlp = spacy.load("es_core_news_sm")
+# T5 loads lazily (or in the background at API startup) through model_loader;
+# spaCy is the shared pipeline from nlp_registry.
+model_loader.register('t5', lambda: (t5_model.load_tokenizer(), t5_model.load_model()), required=False)
 DEFAULT_PROMPT_PREFIX = "Eres un tutor de comunicación aumentativa que responde en español claro y breve."
 DEFAULT_FALLBACK = "No encontré una respuesta específica, pero podemos seguir practicando tus pictogramas."
+GENERATION_CACHE_SIZE = int(os.environ.get('GENERATION_CACHE_SIZE', '512'))
+# Alternative generations kept per cached prompt; replies rotate among them.
+GENERATION_CACHE_VARIANTS = int(os.environ.get('GENERATION_CACHE_VARIANTS', '1'))
 EMOTION_KEYWORDS = {
     'triste': 'triste',
     'asustado': 'miedo',
@@ -26,10 +31,67 @@ EMOTION_KEYWORDS = {
     'contento': 'orgulloso'
 }
 
+class SentenceAnalysis:
+    """Parses the incoming sentence once so every helper of a request shares the same Doc."""
+
+    def __init__(self, sentence: str):
+        self.sentence = sentence
+        self._doc = None
+
+    @property
+    def doc(self):
+        if self._doc is None:
+            self._doc = nlp_registry.pipeline('full')(self.sentence)
+        return self._doc
+
+    @property
+    def entities(self):
+        if not self.sentence:
+            return []
+        return [{'text': ent.text, 'label': ent.label_} for ent in self.doc.ents]
+
+    def tokens_with_pos(self, pos_tags):
+        return [t for t in self.doc if t.pos_ in pos_tags]
+
+
+class _PictogramWordStream:
+    """Emits provisional 'word' entries for streamed text as each word completes.
+
+    Each newly completed span is tagged on its own, so POS tags (and therefore
+    pictograms) can differ from wrapping the whole response; the 'done'
+    package built from the full text is the authoritative processed_sentence.
+    """
+
+    def __init__(self, chatbot, on_event):
+        self.chatbot = chatbot
+        self.on_event = on_event
+        self.text = ''
+        self.stable = 0
+
+    def _emit_span(self, end: int):
+        span = self.text[self.stable:end]
+        self.stable = end
+        if not span.strip():
+            return
+        for entry in self.chatbot._wrap_text_with_pictograms(span):
+            self.on_event({'type': 'word', **entry})
+
+    def feed(self, piece: str):
+        self.text += piece
+        # A word is complete once whitespace follows it; tag only what became complete.
+        cut = max(self.text.rfind(' '), self.text.rfind('\n'))
+        if cut > self.stable:
+            self._emit_span(cut)
+
+    def finish(self):
+        self._emit_span(len(self.text))
+
+
 class Chatbot:
     def __init__(self):
-        self.tokenizer = AutoTokenizer.from_pretrained("mrm8488/spanish-t5-small-sqac-for-qa")
-        self.model = AutoModelForSeq2SeqLM.from_pretrained("mrm8488/spanish-t5-small-sqac-for-qa")
+        self.scheduler = None
+        self._scheduler_lock = threading.Lock()
+        self.generation_cache = LRUCache(GENERATION_CACHE_SIZE)
         self.user_game_states = {}
         # Canonical categories mapped to synonyms for loose matching.
         self.category_synonyms = {
@@ -39,6 +101,55 @@ class Chatbot:
             'escuela': ['escuela', 'clase', 'colegio', 'estudio'],
             'hogar': ['casa', 'hogar', 'familia', 'cocina', 'cuarto']
         }
+        self._drill_pools = None
+        self._drill_pools_version = None
+
+    def fallback_response(self):
+        """Response package used when a turn cannot be processed in time."""
+        return self._package_response(self._single_entry_response(DEFAULT_FALLBACK), ('otra_consulta', 0.0), ('neutral', 0.0))
+
+    def _get_scheduler(self) -> GenerationScheduler:
+        """Scheduler over the loaded T5 model; raises while the model is still loading."""
+        loaded = model_loader.get('t5', wait=False)
+        if loaded is None:
+            raise RuntimeError("T5 model is not loaded")
+        with self._scheduler_lock:
+            if self.scheduler is None:
+                tokenizer, model = loaded
+                self.scheduler = GenerationScheduler(tokenizer, model)
+        return self.scheduler
+
+    def _generate(self, prompt: str, max_input_length: int = 256, max_length: int = 80, site: str = 'open_ended') -> str:
+        """Runs a generation with the call site's decoding profile through the batching scheduler."""
+        return self._get_scheduler().generate(prompt, max_input_length=max_input_length, **decoding_profiles.generate_kwargs(site, max_length))
+
+    def _generate_cached(self, prompt: str, max_input_length: int = 256, max_length: int = 80, site: str = 'open_ended', variants: int | None = None) -> str:
+        """_generate for prompts that do not depend on the user, memoized per prompt and settings."""
+        variants = max(1, GENERATION_CACHE_VARIANTS if variants is None else variants)
+        generate_kwargs = decoding_profiles.generate_kwargs(site, max_length, num_return_sequences=variants)
+        key = (prompt, max_input_length, tuple(sorted(generate_kwargs.items())))
+        pool = self.generation_cache.get(key)
+        if pool is None:
+            texts = self._get_scheduler().generate_all(prompt, max_input_length=max_input_length, **generate_kwargs)
+            pool = list(dict.fromkeys(t for t in texts if t)) or texts
+            self.generation_cache.put(key, pool)
+        return random.choice(pool)
+
+    def _generate_streaming(self, prompt: str, on_event, max_input_length: int = 512, max_length: int = 150, site: str = 'open_ended') -> str:
+        """Streams a generation to on_event as 'text' deltas and 'word' entries once each word completes."""
+        loaded = model_loader.get('t5', wait=False)
+        if loaded is None:
+            raise RuntimeError("T5 model is not loaded")
+        tokenizer, model = loaded
+        words = _PictogramWordStream(self, on_event)
+
+        def on_text(piece):
+            on_event({'type': 'text', 'delta': piece})
+            words.feed(piece)
+
+        text = t5_model.stream_generate(tokenizer, model, prompt, on_text, max_input_length=max_input_length, **decoding_profiles.generate_kwargs(site, max_length))
+        words.finish()
+        return text
 
     def _infer_category(self, sentence_lower: str) -> str | None:
         for canon, terms in self.category_synonyms.items():
@@ -90,7 +201,8 @@ class Chatbot:
         return self.user_game_states[username]
 
     def _wrap_text_with_pictograms(self, text: str, forced_pictogram: str | None = None):
-        doc = nlp(text)
+        # Only POS tags are needed to pick pictogram words.
+        doc = nlp_registry.pipeline('tagger')(text)
         response = []
         for token in doc:
             if not token.text.strip():
@@ -135,8 +247,7 @@ class Chatbot:
     def _valid_pictogram(self, pictogram: dict) -> bool:
         if not pictogram or not pictogram.get('path'):
             return False
-        base = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data/raw/ARASAAC_ES'))
-        return os.path.exists(os.path.join(base, pictogram['path']))
+        return nlp_utils.has_image(pictogram['path'])
 
     def _has_digits(self, text: str) -> bool:
         return bool(re.search(r"\d", text))
@@ -160,24 +271,65 @@ class Chatbot:
                 return True
         return False
 
-    def _start_drill(self, username: str, top_k: int = 3, category: str | None = None):
-        game_state = self._get_user_game_state(username)
-        # Sample pictograms with keywords, short alphabetical keywords, and valid assets.
-        candidates = []
+    def _build_drill_pools(self):
+        """Drill-eligible pictograms (valid asset, short alphabetical keyword), bucketed by category."""
+        valid = []
+        eligible = []
         for p in nlp_utils.pictograms:
             if not self._valid_pictogram(p):
                 continue
+            valid.append(p)
             kws = [kw.get('keyword') for kw in p.get('keywords', []) if kw.get('keyword')]
             if not kws:
                 continue
             main_kw = kws[0]
             if not re.fullmatch(r"[A-Za-záéíóúñüÁÉÍÓÚÑÜ]+", main_kw) or len(main_kw) > 10:
                 continue
-            if self._matches_category(p, category):
-                candidates.append(p)
+            eligible.append(p)
+        with_keywords = [p for p in valid if p.get('keywords')]
+        return {
+            'valid': valid,
+            'with_keywords': with_keywords,
+            'eligible': eligible,
+            'by_category': {canon: [p for p in eligible if self._matches_category(p, canon)] for canon in self.category_synonyms},
+            # Several words can share one image; rounds draw from these so options never repeat a picture.
+            'eligible_by_path': self._group_by_path(eligible),
+            'with_keywords_by_path': self._group_by_path(with_keywords)
+        }
+
+    @staticmethod
+    def _group_by_path(pictograms):
+        groups = {}
+        for p in pictograms:
+            groups.setdefault(p.get('path'), []).append(p)
+        return list(groups.values())
+
+    @staticmethod
+    def _sample_distinct_paths(groups, k, exclude_paths):
+        """Up to k pictograms with distinct paths outside exclude_paths, one random word per path."""
+        # Each excluded path removes at most one group, so oversampling by their count still leaves k.
+        drawn = random.sample(groups, k=min(len(groups), k + len(exclude_paths)))
+        return [random.choice(group) for group in drawn if group[0].get('path') not in exclude_paths][:k]
+
+    def _drill_pools_for_catalog(self):
+        # Rebuilt only when nlp_utils reloads the catalog.
+        if self._drill_pools is None or self._drill_pools_version != nlp_utils.catalog_version:
+            self._drill_pools = self._build_drill_pools()
+            self._drill_pools_version = nlp_utils.catalog_version
+        return self._drill_pools
+
+    def _start_drill(self, username: str, top_k: int = 3, category: str | None = None):
+        game_state = self._get_user_game_state(username)
+        pools = self._drill_pools_for_catalog()
+        if not category:
+            candidates = pools['eligible']
+        elif category in pools['by_category']:
+            candidates = pools['by_category'][category]
+        else:
+            candidates = [p for p in pools['eligible'] if self._matches_category(p, category)]
         if len(candidates) < 3:
             # Fallback to general pool if category is too narrow.
-            fallback_items = [p for p in nlp_utils.pictograms if self._valid_pictogram(p)]
+            fallback_items = pools['valid']
             if len(fallback_items) >= 3:
                 candidates = fallback_items
             else:
@@ -199,23 +351,16 @@ class Chatbot:
 
     def _drill_next_round(self, username: str, previous_items: list):
         game_state = self._get_user_game_state(username)
-        candidates = []
+        pools = self._drill_pools_for_catalog()
         prev_paths = {p.get('path') for p in previous_items if isinstance(p, dict) and p.get('path')}
-        for p in nlp_utils.pictograms:
-            if p.get('path') in prev_paths:
-                continue
-            if not self._valid_pictogram(p):
-                continue
-            kws = [kw.get('keyword') for kw in p.get('keywords', []) if kw.get('keyword')]
-            if not kws:
-                continue
-            main_kw = kws[0]
-            if not re.fullmatch(r"[A-Za-záéíóúñüÁÉÍÓÚÑÜ]+", main_kw) or len(main_kw) > 10:
-                continue
-            candidates.append(p)
-        if not candidates:
-            candidates = [p for p in nlp_utils.pictograms if p.get('keywords') and self._valid_pictogram(p)]
-        items = random.sample(candidates, k=min(3, len(candidates)))
+        items = self._sample_distinct_paths(pools['eligible_by_path'], 3, prev_paths)
+        if len(items) < 3:
+            # Fill the round from any pictogram with keywords, still without repeating an image.
+            used = prev_paths | {p.get('path') for p in items}
+            items += self._sample_distinct_paths(pools['with_keywords_by_path'], 3 - len(items), used)
+        if not items:
+            candidates = pools['with_keywords']
+            items = random.sample(candidates, k=min(3, len(candidates)))
         game_state["drill_items"] = items
         game_state["drill_round"] += 1
         target = (items[0].get('keywords') or [{}])[0].get('keyword') or ""
@@ -315,15 +460,13 @@ class Chatbot:
     def _detect_intent_emotion(self, sentence: str):
         if not sentence:
             return ('otra_consulta', 0.0), ('neutral', 0.0)
-        intent = intent_classifier.predict_intent(sentence)
-        emotion = emotion_classifier.predict_emotion(sentence)
-        return intent, emotion
+        return intent_emotion_classifier.predict_intent_emotion(sentence)
 
-    def _extract_entities(self, sentence: str):
+    def _extract_entities(self, sentence: str, analysis: SentenceAnalysis | None = None):
         if not sentence:
             return []
-        doc = nlp(sentence)
-        return [{'text': ent.text, 'label': ent.label_} for ent in doc.ents]
+        analysis = analysis or SentenceAnalysis(sentence)
+        return analysis.entities
 
     def _maybe_scripted_response(self, username: str, sentence_lower: str, role: str):
         game_state = self._get_user_game_state(username)
@@ -337,9 +480,7 @@ class Chatbot:
                 f"Tarea: {task}. Palabras: {', '.join(words)}."
             )
             try:
-                inputs = self.tokenizer.encode(prompt, return_tensors="pt", max_length=256, truncation=True)
-                outputs = self.model.generate(inputs, max_length=80, num_beams=4, early_stopping=True)
-                text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+                text = self._generate_cached(prompt, max_input_length=256, max_length=80, site='greeting')
             except Exception:
                 text = f"Vamos a {task}." if task else "¡Vamos a practicar!"
 
@@ -360,9 +501,7 @@ class Chatbot:
             "Separa los pasos con ' || '."
         )
         try:
-            inputs = self.tokenizer.encode(prompt, return_tensors="pt", max_length=256, truncation=True)
-            outputs = self.model.generate(inputs, max_length=150, num_beams=4, early_stopping=True)
-            decoded = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            decoded = self._generate(prompt, max_input_length=256, max_length=150, site='scenario_steps')
         except Exception:
             return scenario.get('steps') or []
         parts = [segment.strip(" -:\n") for segment in decoded.split('||') if segment.strip()]
@@ -392,8 +531,9 @@ class Chatbot:
     def _scenario_template_response(self, username: str, sentence: str, sentence_lower: str, intent_label: str, emotion_label: str):
         return None
 
-    def _related_vocab_response(self, sentence: str):
-        tokens = [t for t in nlp(sentence) if t.pos_ in {"NOUN", "PROPN"}]
+    def _related_vocab_response(self, sentence: str, analysis: SentenceAnalysis | None = None):
+        analysis = analysis or SentenceAnalysis(sentence)
+        tokens = analysis.tokens_with_pos({"NOUN", "PROPN"})
         if not tokens:
             return None
         focus = tokens[0].lemma_.lower()
@@ -425,9 +565,7 @@ class Chatbot:
             f"Emoción: {emotion_label}."
         )
         try:
-            inputs = self.tokenizer.encode(prompt, return_tensors="pt", max_length=256, truncation=True)
-            outputs = self.model.generate(inputs, max_length=70, num_beams=4, early_stopping=True)
-            text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            text = self._generate_cached(prompt, max_input_length=256, max_length=70, site='emotion_support')
         except Exception:
             text = "Respira conmigo, toca calma o abrazo y dime cómo sigues."
 
@@ -453,17 +591,17 @@ class Chatbot:
     def _consent_response(self, username: str, sentence: str, sentence_lower: str):
         action = self._extract_permission_action(sentence_lower)
         consent_manager.log_audit('chatbot_consent_request', username, metadata={'text': sentence})
+        # The cached prompt is template-only; the user's request is repeated outside the generation.
         prompt = (
-            "Eres un tutor AAC en español. Responde en 18 palabras. "
-            "1) Agradece y confirma que avisarás al adulto. 2) Pide esperar con pictograma de pausa. 3) Repite la acción pedida. "
-            f"Petición: {action or sentence}."
+            "Eres un tutor AAC en español. Responde en 14 palabras. "
+            "1) Agradece y confirma que avisarás al adulto. 2) Pide esperar con pictograma de pausa."
         )
         try:
-            inputs = self.tokenizer.encode(prompt, return_tensors="pt", max_length=256, truncation=True)
-            outputs = self.model.generate(inputs, max_length=70, num_beams=4, early_stopping=True)
-            text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            text = self._generate_cached(prompt, max_input_length=256, max_length=70, site='consent')
         except Exception:
             text = "Aviso al adulto, usa pausa y esperamos juntos."
+        if action:
+            text = f"{text} Pediste: {action}."
 
         pictogram = nlp_utils.find_pictogram('pausa', nlp_utils.pictograms) or nlp_utils.find_pictogram('esperar', nlp_utils.pictograms)
         pictogram_path = pictogram['path'] if pictogram else None
@@ -485,12 +623,13 @@ class Chatbot:
     def start_game(self, username: str, category=None):
         """Starts a new game for a specific user."""
         game_state = self._get_user_game_state(username)
-        pictogram_pool = nlp_utils.pictograms
         if category:
-            pictogram_pool = [p for p in pictogram_pool if category in p.get('tags', [])]
-        if not pictogram_pool:
+            has_pool = nlp_utils.has_tag(category)
+        else:
+            has_pool = bool(nlp_utils.pictograms)
+        if not has_pool:
             return {"text": f"No pictograms found for category '{category}'.", "pictogram": None}
-        valid_pictograms = [p for p in pictogram_pool if p.get('keywords')]
+        valid_pictograms = nlp_utils.pictograms_with_keywords(category or None)
         if not valid_pictograms:
             return {"text": f"No usable pictograms with keywords found for category '{category}'.", "pictogram": None}
         pictogram = random.choice(valid_pictograms)
@@ -533,13 +672,15 @@ class Chatbot:
         game_state["correct_answer"] = first_word
         game_state["pictogram_path"] = pictogram['path'] if pictogram else None
 
-    def process_sentence(self, username: str, sentence: str, role: str | None = None):
+    def process_sentence(self, username: str, sentence: str, role: str | None = None, on_event=None):
         """
         Processes a sentence for a given user, handles game logic, and generates a response.
+        When on_event is given, the open-ended generation is streamed to it (see _generate_streaming).
         """
         game_state = self._get_user_game_state(username)
         sentence_lower = sentence.lower()
         role = role or 'student'
+        analysis = SentenceAnalysis(sentence)
         intent_info, emotion_info = self._detect_intent_emotion(sentence)
         intent_label, intent_score = intent_info
         emotion_label, _ = emotion_info
@@ -563,14 +704,14 @@ class Chatbot:
             pictogram = nlp_utils.find_pictogram('doctor', nlp_utils.pictograms) or nlp_utils.find_pictogram('ayuda', nlp_utils.pictograms)
             pictogram_path = pictogram['path'] if pictogram and self._valid_pictogram(pictogram) else None
             text = "Siento que te duele. Respira 3 veces, toca ayuda/médico y avisa a tu adulto." 
-            return self._package_response(self._single_entry_response(text, pictogram_path), ('salud', 0.7), emotion_info, suggested_pictograms=self._suggest_pictograms(sentence), entities=self._extract_entities(sentence))
+            return self._package_response(self._single_entry_response(text, pictogram_path), ('salud', 0.7), emotion_info, suggested_pictograms=self._suggest_pictograms(sentence), entities=self._extract_entities(sentence, analysis))
 
         # If intent confidence is low, fall back to open-ended generation to avoid misroutes.
         if intent_score < 0.5:
             intent_label = 'otra_consulta'
             intent_info = (intent_label, intent_score)
         suggested_pictograms = self._suggest_pictograms(sentence)
-        entities = self._extract_entities(sentence)
+        entities = self._extract_entities(sentence, analysis)
 
         if game_state["in_progress"]:
             # Allow user to exit any game mode explicitly
@@ -647,9 +788,7 @@ class Chatbot:
                             f"Palabra: {next_word}. Sé cálido y usa menos de 15 palabras."
                         )
                         try:
-                            inputs = self.tokenizer.encode(prompt, return_tensors="pt", max_length=256, truncation=True)
-                            outputs = self.model.generate(inputs, max_length=60, num_beams=4, early_stopping=True)
-                            success_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+                            success_text = self._generate_cached(prompt, max_input_length=256, max_length=60, site='reinforcement')
                         except Exception:
                             success_text = "¡Muy bien!"
                         return self._package_response(self._single_entry_response(success_text, game_state["pictogram_path"]), intent_info, emotion_info, suggested_pictograms, entities)
@@ -660,9 +799,7 @@ class Chatbot:
                             "Usa menos de 18 palabras y tono alegre."
                         )
                         try:
-                            inputs = self.tokenizer.encode(prompt, return_tensors="pt", max_length=256, truncation=True)
-                            outputs = self.model.generate(inputs, max_length=60, num_beams=4, early_stopping=True)
-                            farewell = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+                            farewell = self._generate_cached(prompt, max_input_length=256, max_length=60, site='farewell')
                         except Exception:
                             farewell = "¡Felicidades! Has completado la sesión."
                         return self._package_response(self._single_entry_response(farewell), intent_info, emotion_info, suggested_pictograms, entities)
@@ -674,9 +811,7 @@ class Chatbot:
                         f"Letra inicial: {clue.upper()}. Máximo 12 palabras."
                     )
                     try:
-                        inputs = self.tokenizer.encode(prompt, return_tensors="pt", max_length=128, truncation=True)
-                        outputs = self.model.generate(inputs, max_length=40, num_beams=4, early_stopping=True)
-                        hint_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+                        hint_text = self._generate_cached(prompt, max_input_length=128, max_length=40, site='hint')
                     except Exception:
                         hint_text = f"La palabra comienza con {clue.upper()}."
                     return self._package_response(self._single_entry_response(hint_text, game_state["pictogram_path"]), intent_info, emotion_info, suggested_pictograms, entities)
@@ -714,7 +849,7 @@ class Chatbot:
                     return self._package_response(self._single_entry_response(text, pictogram['path'] if pictogram else None), intent_info, emotion_info, suggested_pictograms, entities)
 
             if intent_label == 'concepto_relacionado':
-                related = self._related_vocab_response(sentence)
+                related = self._related_vocab_response(sentence, analysis)
                 if related:
                     return self._package_response(related, intent_info, emotion_info, suggested_pictograms, entities)
 
@@ -741,9 +876,10 @@ class Chatbot:
 
             input_text = self._compose_transformer_input(username, sentence, role)
             try:
-                inputs = self.tokenizer.encode(input_text, return_tensors="pt", max_length=512, truncation=True)
-                outputs = self.model.generate(inputs, max_length=150, num_beams=4, early_stopping=True)
-                response_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+                if on_event is not None:
+                    response_text = self._generate_streaming(input_text, on_event, max_input_length=512, max_length=150, site='open_ended')
+                else:
+                    response_text = self._generate(input_text, max_input_length=512, max_length=150, site='open_ended')
             except Exception:
                 fallback_text = DEFAULT_FALLBACK
                 return self._package_response(self._wrap_text_with_pictograms(fallback_text), intent_info, emotion_info, suggested_pictograms, entities)
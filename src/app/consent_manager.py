@@ -6,6 +6,8 @@ from typing import Dict, List, Optional
 
 from fastapi import HTTPException
 
+from src.app import interaction_logger, interaction_store
+
 CONSENT_FILE = os.path.join('data', 'consents.json')
 DATA_EXPORT_DIR = os.path.join('data', 'exports')
 AUDIT_LOG = os.path.join('data', 'logs', 'audit_logs.json')
@@ -53,9 +55,10 @@ def log_audit(action: str, actor: str, target: Optional[str] = None, metadata: O
         'target': target,
         'metadata': metadata or {}
     }
-    os.makedirs(os.path.dirname(AUDIT_LOG), exist_ok=True)
-    with open(AUDIT_LOG, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    # Daily partitions under data/logs/audit_logs/, gzipped once the day is over.
+    # Written by the background logger so the fsync and the daily compression
+    # stay off the request path.
+    interaction_logger.logger.submit(interaction_store.get_store(AUDIT_LOG, backend='jsonl'), entry)
 
 
 def export_user_data(username: str) -> str:
@@ -64,18 +67,7 @@ def export_user_data(username: str) -> str:
     os.makedirs(DATA_EXPORT_DIR, exist_ok=True)
     export_path = os.path.join(DATA_EXPORT_DIR, f"export_{username}_{datetime.utcnow().timestamp():.0f}.json")
 
-    logs = []
-    if os.path.exists(data_manager.LOG_FILE):
-        with open(data_manager.LOG_FILE, 'r', encoding='utf-8') as f:
-            for line in f:
-                if not line.strip():
-                    continue
-                try:
-                    entry = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                if entry.get('username') == username:
-                    logs.append(entry)
+    logs = data_manager.interactions(flush=True).query([username])
 
     notes = [note for note in data_manager.get_notes() if note.get('author') == username]
     assignments = [assignment for assignment in data_manager.get_assignments() if assignment.get('author') == username]
@@ -95,19 +87,7 @@ def export_user_data(username: str) -> str:
 def delete_user_data(username: str):
     from src.app import data_manager
 
-    if os.path.exists(data_manager.LOG_FILE):
-        with open(data_manager.LOG_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        with open(data_manager.LOG_FILE, 'w', encoding='utf-8') as f:
-            for line in lines:
-                if not line.strip():
-                    continue
-                try:
-                    obj = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                if obj.get('username') != username:
-                    f.write(json.dumps(obj, ensure_ascii=False) + '\n')
+    data_manager.delete_interactions(username)
 
     remaining_notes = [note for note in data_manager.get_notes() if note.get('author') != username]
     with open(data_manager.NOTES_FILE, 'w', encoding='utf-8') as f:
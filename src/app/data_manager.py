@@ -1,10 +1,9 @@
 import json
 import os
 from datetime import datetime
-from collections import Counter
 import copy
 
-from src.app import support_pack_manager
+from src.app import support_pack_manager, interaction_store, interaction_logger, progress_aggregates
 
 LOG_FILE = 'data/logs/usage_logs.json'
 NOTES_FILE = 'data/notes.json'
@@ -217,9 +216,31 @@ DEFAULT_SUPPORT_CONTENT = {
     ]
 }
 
+def interactions(flush: bool = False):
+    """Query API over the usage log for the current LOG_FILE (see interaction_store).
+
+    Entries still buffered by the background logger are not visible unless
+    flush=True, which writes them first; exports, reports and deletions use it.
+    """
+    if flush:
+        interaction_logger.logger.flush()
+    return interaction_store.get_store(LOG_FILE)
+
+
+def _progress():
+    return progress_aggregates.for_store(interactions())
+
+
+def delete_interactions(username: str) -> int:
+    """Removes a user's usage logs and their cached progress aggregate."""
+    store = interactions(flush=True)
+    removed = store.delete_user(username)
+    progress_aggregates.for_store(store).forget(username)
+    return removed
+
+
 def log_interaction(username, sentence, processed_sentence, intent=None, emotion=None, suggested_pictograms=None, entities=None, response_time_ms=None):
-    """Logs the user's sentence and the processed pictograms to a JSON file."""
-    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    """Queues the user's sentence and the processed pictograms for the background logger."""
     log_entry = {
         'timestamp': datetime.now().isoformat(),
         'username': username,
@@ -231,28 +252,13 @@ def log_interaction(username, sentence, processed_sentence, intent=None, emotion
         'entities': entities,
         'response_time_ms': response_time_ms
     }
-    try:
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
-    except IOError as e:
-        print(f"Error writing to log file: {e}")
+    progress = _progress()
+    progress.record(log_entry)
+    interaction_logger.logger.submit(progress, log_entry)
 
 
 def get_recent_interactions(username: str, limit: int = 20):
-    if not os.path.exists(LOG_FILE):
-        return []
-    interactions = []
-    with open(LOG_FILE, 'r', encoding='utf-8') as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                log = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            if log.get('username') == username:
-                interactions.append(log)
-    return interactions[-limit:]
+    return _progress().recent(username, limit)
 
 def get_notes():
     """Retrieves all notes from the notes file."""
@@ -497,58 +503,13 @@ def load_support_content():
 
 
 def get_user_progress_summary(username):
-    """Aggregates simple progress stats for a user to personalize responses."""
-    if not os.path.exists(LOG_FILE):
-        return {
-            'total_interactions': 0,
-            'most_common_words': [],
-            'last_interaction': None
-        }
-
-    with open(LOG_FILE, 'r', encoding='utf-8') as f:
-        logs = [json.loads(line) for line in f if line.strip()]
-
-    user_logs = [log for log in logs if log.get('username') == username]
-    if not user_logs:
-        return {
-            'total_interactions': 0,
-            'most_common_words': [],
-            'last_interaction': None
-        }
-
-    all_words = [
-        item.get('word')
-        for log in user_logs
-        for item in log.get('processed_sentence', [])
-        if item.get('word')
-    ]
-    word_counts = Counter(all_words)
-    most_common = word_counts.most_common(3)
-    last_interaction = max(log.get('timestamp') for log in user_logs)
-
-    return {
-        'total_interactions': len(user_logs),
-        'most_common_words': most_common,
-        'last_interaction': last_interaction
-    }
+    """Progress stats for a user to personalize responses, from the running per-user aggregates."""
+    return _progress().summary(username)
 
 
 def get_usage_logs_for_users(usernames, limit=50):
     """Return recent logs for a list of usernames (most recent last)."""
-    if not os.path.exists(LOG_FILE):
-        return []
-    results = []
-    with open(LOG_FILE, 'r', encoding='utf-8') as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                log = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            if log.get('username') in usernames:
-                results.append(log)
-    return results[-limit:]
+    return interactions().query(usernames, limit=limit)
 
 
 def aggregate_intents_emotions(usernames):
@@ -0,0 +1,69 @@
+import os
+import threading
+
+# Named decoding settings for T5 generate; max_length caps each call site's own max_length.
+DECODING_PROFILES = {
+    'quality': {'num_beams': 4, 'max_length': 150, 'do_sample': False},
+    'balanced': {'num_beams': 2, 'max_length': 80, 'do_sample': False},
+    'fast': {'num_beams': 1, 'max_length': 40, 'do_sample': False},
+}
+
+# Profile used by each generation site in Chatbot unless overridden with
+# DECODING_PROFILE_<SITE> (e.g. DECODING_PROFILE_HINT=quality).
+DEFAULT_SITE_PROFILES = {
+    'open_ended': 'quality',
+    'scenario_steps': 'quality',
+    'greeting': 'balanced',
+    'emotion_support': 'balanced',
+    'consent': 'balanced',
+    'reinforcement': 'fast',
+    'farewell': 'fast',
+    'hint': 'fast',
+}
+
+SAMPLING_TOP_P = 0.9
+
+
+def _env_profile(site: str, default: str) -> str:
+    name = os.environ.get(f'DECODING_PROFILE_{site.upper()}', default)
+    if name not in DECODING_PROFILES:
+        raise ValueError(f"DECODING_PROFILE_{site.upper()}: unknown decoding profile '{name}' (expected one of {', '.join(DECODING_PROFILES)})")
+    return name
+
+
+_lock = threading.Lock()
+_site_profiles = {site: _env_profile(site, profile) for site, profile in DEFAULT_SITE_PROFILES.items()}
+
+
+def set_site_profile(site: str, profile: str):
+    """Switches the profile a call site uses at runtime."""
+    if profile not in DECODING_PROFILES:
+        raise ValueError(f"Unknown decoding profile '{profile}'")
+    with _lock:
+        _site_profiles[site] = profile
+
+
+def get_site_profiles():
+    with _lock:
+        return dict(_site_profiles)
+
+
+def generate_kwargs(site: str, max_length: int, num_return_sequences: int = 1) -> dict:
+    """generate() keyword arguments for a call site, capped at that site's max_length."""
+    with _lock:
+        name = _site_profiles.get(site, 'quality')
+    profile = DECODING_PROFILES.get(name, DECODING_PROFILES['quality'])
+    num_beams = profile['num_beams']
+    do_sample = profile['do_sample']
+    if num_return_sequences > 1 and not do_sample and num_beams < num_return_sequences:
+        # Not enough beams to return N distinct sequences; sample them instead.
+        do_sample = True
+    kwargs = {'max_length': min(max_length, profile['max_length']), 'num_beams': num_beams}
+    if num_beams > 1:
+        kwargs['early_stopping'] = True
+    if do_sample:
+        kwargs['do_sample'] = True
+        kwargs['top_p'] = SAMPLING_TOP_P
+    if num_return_sequences > 1:
+        kwargs['num_return_sequences'] = num_return_sequences
+    return kwargs
@@ -0,0 +1,115 @@
+import os
+import queue
+import threading
+import time
+
+GENERATION_MAX_BATCH_SIZE = int(os.environ.get('GENERATION_MAX_BATCH_SIZE', '8'))
+GENERATION_MAX_WAIT_MS = float(os.environ.get('GENERATION_MAX_WAIT_MS', '10'))
+
+
+class _PendingGeneration:
+    def __init__(self, prompt: str, max_input_length: int, generate_kwargs: dict):
+        self.prompt = prompt
+        self.max_input_length = max_input_length
+        self.generate_kwargs = generate_kwargs
+        self.group_key = (max_input_length, tuple(sorted(generate_kwargs.items())))
+        self.done = threading.Event()
+        self.texts = None
+        self.error = None
+
+
+class GenerationScheduler:
+    """Collects prompts from concurrent callers and runs them as padded generate batches.
+
+    A worker thread waits up to max_wait_ms after the first queued prompt for
+    more to arrive (at most max_batch_size), groups them by decoding settings
+    and input length, and hands each caller its own decoded text.
+    """
+
+    def __init__(self, tokenizer, model, max_batch_size: int | None = None, max_wait_ms: float | None = None):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_batch_size = max(1, GENERATION_MAX_BATCH_SIZE if max_batch_size is None else max_batch_size)
+        self.max_wait = max(0.0, GENERATION_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+
+    def generate(self, prompt: str, max_input_length: int = 256, **generate_kwargs) -> str:
+        """Returns the decoded generation for prompt; raises whatever generate raised."""
+        return self.generate_all(prompt, max_input_length=max_input_length, **generate_kwargs)[0]
+
+    def generate_all(self, prompt: str, max_input_length: int = 256, **generate_kwargs) -> list:
+        """Returns every returned sequence (num_return_sequences) for prompt."""
+        pending = _PendingGeneration(prompt, max_input_length, generate_kwargs)
+        if self.max_batch_size == 1:
+            self._run_batch([pending])
+        else:
+            self._ensure_worker()
+            self._queue.put(pending)
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.texts
+
+    def stats(self):
+        batches = self._batches
+        return {
+            'batches': batches,
+            'requests': self._requests,
+            'avg_batch_size': round(self._requests / batches, 2) if batches else 0.0,
+            'queued': self._queue.qsize()
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='generation-scheduler', daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            groups = {}
+            for pending in self._collect():
+                groups.setdefault(pending.group_key, []).append(pending)
+            for group in groups.values():
+                self._run_batch(group)
+
+    def _run_batch(self, group):
+        first = group[0]
+        try:
+            inputs = self.tokenizer(
+                [pending.prompt for pending in group],
+                return_tensors="pt",
+                padding=True,
+                max_length=first.max_input_length,
+                truncation=True
+            )
+            outputs = self.model.generate(**inputs, **first.generate_kwargs)
+            texts = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+            per_prompt = first.generate_kwargs.get('num_return_sequences', 1)
+            for i, pending in enumerate(group):
+                pending.texts = texts[i * per_prompt:(i + 1) * per_prompt]
+        except Exception as exc:
+            for pending in group:
+                pending.error = exc
+        finally:
+            self._batches += 1
+            self._requests += len(group)
+            for pending in group:
+                pending.done.set()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+INFERENCE_CONCURRENCY = int(os.environ.get('INFERENCE_CONCURRENCY', str(min(4, os.cpu_count() or 1))))
+INFERENCE_TIMEOUT_S = float(os.environ.get('INFERENCE_TIMEOUT_S', '30'))
+
+
+class InferenceTimeout(TimeoutError):
+    """The job did not finish within the request timeout."""
+
+
+class InferencePool:
+    """Bounded thread pool for blocking model work, with queue-depth metrics and per-call timeouts.
+
+    Jobs given the same serial_key run one at a time, in submission order. A
+    job waits for its predecessor in the event loop, not in a worker, so one
+    key can never hold more than one worker.
+    """
+
+    def __init__(self, max_workers: int | None = None, timeout_s: float | None = None):
+        self.max_workers = max(1, INFERENCE_CONCURRENCY if max_workers is None else max_workers)
+        self.timeout_s = INFERENCE_TIMEOUT_S if timeout_s is None else timeout_s
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inference')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        # serial_key -> gate of the last job submitted with that key.
+        self._tails = {}
+
+    def _job(self, fn, args, kwargs, state):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        else:
+            with self._lock:
+                # A job that outlived its timeout is already counted in timeouts.
+                if not state['timed_out']:
+                    self._completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _serial_gate(self, key):
+        """(gate of the previous job with key or None, gate this job opens when it is done)."""
+        gate = Future()
+        with self._lock:
+            previous = self._tails.get(key)
+            self._tails[key] = gate
+        gate.add_done_callback(lambda _: self._drop_tail(key, gate))
+        return previous, gate
+
+    def _drop_tail(self, key, gate):
+        with self._lock:
+            if self._tails.get(key) is gate:
+                del self._tails[key]
+
+    async def run(self, fn, *args, timeout: float | None = None, serial_key=None, **kwargs):
+        """Runs fn in the pool; raises InferenceTimeout if it takes longer than timeout seconds.
+
+        The timeout includes the wait for earlier jobs with the same serial_key.
+        """
+        timeout = self.timeout_s if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        state = {'timed_out': False}
+        with self._lock:
+            self._queued += 1
+        previous, gate = self._serial_gate(serial_key) if serial_key is not None else (None, None)
+        future = None
+        try:
+            if previous is not None:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(previous)), timeout)
+            future = self._executor.submit(self._job, fn, args, kwargs, state)
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+                state['timed_out'] = True
+                # Jobs still waiting are dropped; running ones finish in the background.
+                if future is None or future.cancel():
+                    self._queued -= 1
+            raise InferenceTimeout(f"{getattr(fn, '__name__', 'job')} exceeded {timeout}s")
+        except asyncio.CancelledError:
+            if future is None:
+                with self._lock:
+                    self._queued -= 1
+            raise
+        finally:
+            if gate is not None:
+                # The next job with this key starts once this one has really
+                # finished (a timed-out job keeps running), or, if it never
+                # started, once its own predecessor has.
+                source = future or previous
+                if source is None:
+                    gate.set_result(None)
+                else:
+                    source.add_done_callback(lambda _: gate.set_result(None))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'timeout_s': self.timeout_s,
+                'queue_depth': self._queued,
+                'running': self._running,
+                'completed': self._completed,
+                'failed': self._failed,
+                'timeouts': self._timeouts
+            }
+
+
+pool = InferencePool()
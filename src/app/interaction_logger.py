@@ -0,0 +1,144 @@
+import atexit
+import os
+import threading
+import time
+
+# Entries per write; 1 writes synchronously in the caller.
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', '64'))
+LOG_FLUSH_INTERVAL_MS = float(os.environ.get('LOG_FLUSH_INTERVAL_MS', '200'))
+# Beyond this many pending entries the caller writes the backlog itself.
+LOG_QUEUE_MAX = int(os.environ.get('LOG_QUEUE_MAX', '10000'))
+
+
+class BufferedLogger:
+    """Queues log entries and writes them in batches from a background thread.
+
+    Each entry is queued with its sink (anything with append_many(entries)).
+    The worker flushes when LOG_BATCH_SIZE entries are pending or
+    LOG_FLUSH_INTERVAL_MS has passed since the oldest one was queued.
+    """
+
+    def __init__(self, batch_size: int | None = None, flush_interval_ms: float | None = None, queue_max: int | None = None):
+        self.batch_size = max(1, LOG_BATCH_SIZE if batch_size is None else batch_size)
+        self.flush_interval_ms = LOG_FLUSH_INTERVAL_MS if flush_interval_ms is None else flush_interval_ms
+        self.queue_max = LOG_QUEUE_MAX if queue_max is None else queue_max
+        self._pending = []
+        self._oldest = None
+        self._cond = threading.Condition()
+        # Held while a batch is taken and written, so flush() returns only after
+        # everything queued before it is on disk.
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._stopped = False
+        self._submitted = 0
+        self._written = 0
+        self._failed = 0
+        self._batches = 0
+        self._inline_flushes = 0
+        self._max_depth = 0
+        self._last_flush_ms = None
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='interaction-logger', daemon=True)
+            self._worker.start()
+
+    def submit(self, sink, entry: dict):
+        if self.batch_size == 1 or self._stopped:
+            with self._cond:
+                self._submitted += 1
+            self._write([(sink, entry)])
+            return
+        with self._cond:
+            self._pending.append((sink, entry))
+            self._submitted += 1
+            depth = len(self._pending)
+            self._max_depth = max(self._max_depth, depth)
+            self._ensure_worker()
+            if self._oldest is None:
+                # Start the flush timer for this batch.
+                self._oldest = time.monotonic()
+                self._cond.notify()
+            elif depth >= self.batch_size:
+                self._cond.notify()
+        if depth >= self.queue_max:
+            # The writer is not keeping up; make the caller pay for the backlog.
+            with self._cond:
+                self._inline_flushes += 1
+            self.flush()
+
+    def flush(self):
+        """Writes everything queued so far, waiting for a batch the worker is already writing."""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending, self._oldest = self._pending, [], None
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        by_sink = {}
+        for sink, entry in batch:
+            by_sink.setdefault(sink, []).append(entry)
+        written = failed = 0
+        for sink, entries in by_sink.items():
+            try:
+                sink.append_many(entries)
+                written += len(entries)
+            except Exception as e:
+                failed += len(entries)
+                print(f"Error writing to log file: {e}")
+        with self._cond:
+            self._written += written
+            self._failed += failed
+            self._batches += 1
+            self._last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    def _run(self):
+        interval = self.flush_interval_ms / 1000
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                    if self._oldest is not None:
+                        remaining = self._oldest + interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                stopped = self._stopped
+            self.flush()
+            if stopped:
+                return
+
+    def shutdown(self):
+        """Flushes pending entries and stops the worker; later entries are written synchronously."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._pending),
+                'max_queue_depth': self._max_depth,
+                'queue_max': self.queue_max,
+                'batch_size': self.batch_size,
+                'flush_interval_ms': self.flush_interval_ms,
+                'submitted': self._submitted,
+                'written': self._written,
+                'failed': self._failed,
+                'batches': self._batches,
+                'inline_flushes': self._inline_flushes,
+                'last_flush_ms': self._last_flush_ms
+            }
+
+
+logger = BufferedLogger()
+atexit.register(logger.flush)
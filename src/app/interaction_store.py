@@ -0,0 +1,401 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from datetime import date, datetime
+
+# 'sqlite' (default) keeps interactions in an indexed database next to the
+# JSONL log; 'jsonl' keeps daily JSONL partitions.
+INTERACTION_STORE = os.environ.get('INTERACTION_STORE', 'sqlite').lower()
+LOG_PARTITION_COMPRESS = os.environ.get('LOG_PARTITION_COMPRESS', '1').lower() not in ('0', 'false', 'no')
+
+_DAY_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+_PARTITION_RE = re.compile(r'^(\d{4}-\d{2}-\d{2})\.jsonl(\.gz)?$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT,
+    timestamp TEXT,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_interactions_username_ts ON interactions (username, timestamp);
+CREATE INDEX IF NOT EXISTS idx_interactions_ts ON interactions (timestamp);
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _normalize_bound(value: str | None) -> str | None:
+    """ISO bound in the same format as logged timestamps; raises ValueError like fromisoformat."""
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).isoformat()
+
+
+def _is_gzip(path: str) -> bool:
+    return path.endswith('.gz') or path.endswith('.gz.tmp')
+
+
+def _open_text(path: str, mode: str = 'r'):
+    if _is_gzip(path):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _read_jsonl(path: str):
+    if not os.path.exists(path):
+        return
+    with _open_text(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _read_jsonl_reverse(path: str, block_size: int = 65536):
+    """Entries from the end of a JSONL file backwards, reading it in blocks."""
+    if _is_gzip(path):
+        # gzip streams cannot be read backwards; a compressed partition is a single day.
+        yield from reversed(list(_read_jsonl(path)))
+        return
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        remainder = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + remainder).split(b'\n')
+            # The first piece may be the tail of a line that starts in an earlier block.
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+        if remainder.strip():
+            try:
+                yield json.loads(remainder)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                pass
+
+
+def _write_jsonl(path: str, entries, mode: str = 'w'):
+    """Writes entries with a single write and fsync; gzip files are appended as a new member."""
+    data = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+    with open(path, mode + 'b') as raw:
+        if _is_gzip(path):
+            with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+                gz.write(data.encode('utf-8'))
+        else:
+            raw.write(data.encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _rewrite_jsonl_without(path: str, username: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    kept = []
+    removed = 0
+    for entry in _read_jsonl(path):
+        if entry.get('username') == username:
+            removed += 1
+        else:
+            kept.append(entry)
+    if removed:
+        tmp_path = path + '.tmp'
+        _write_jsonl(tmp_path, kept)
+        os.replace(tmp_path, path)
+    return removed
+
+
+class PartitionedJsonlStore:
+    """JSONL log split into daily partitions: <log name>/YYYY-MM-DD.jsonl.
+
+    Partitions of past days are gzipped (LOG_PARTITION_COMPRESS=0 turns that
+    off); late entries for a closed day are appended as an extra gzip member.
+    Queries only open the partitions inside their start/end range, and queries
+    with a limit walk partitions newest first, reading each one backwards and
+    stopping after `limit` matches. An existing single-file log is split into
+    partitions the first time the store is opened.
+    """
+
+    backend = 'jsonl'
+
+    def __init__(self, log_file: str, partition_dir: str | None = None):
+        self.log_file = log_file
+        self.partition_dir = partition_dir or os.path.splitext(log_file)[0]
+        self._lock = threading.Lock()
+        self._compressed_through = None
+        self._import_legacy()
+
+    @staticmethod
+    def _day(entry: dict) -> str:
+        ts = entry.get('timestamp') or ''
+        return ts[:10] if _DAY_RE.match(ts) else date.today().isoformat()
+
+    def _path(self, day: str, compressed: bool = False) -> str:
+        return os.path.join(self.partition_dir, f"{day}.jsonl" + ('.gz' if compressed else ''))
+
+    def _import_legacy(self):
+        marker = os.path.join(self.partition_dir, '.imported')
+        with self._lock:
+            if os.path.exists(marker):
+                return
+            os.makedirs(self.partition_dir, exist_ok=True)
+            by_day = {}
+            for entry in _read_jsonl(self.log_file):
+                by_day.setdefault(self._day(entry), []).append(entry)
+            for day, entries in by_day.items():
+                _write_jsonl(self._path(day), entries, mode='a')
+            with open(marker, 'w', encoding='utf-8') as f:
+                f.write(datetime.now().isoformat())
+            self._compress_closed()
+
+    def _partitions(self, start: str | None = None, end: str | None = None):
+        """(day, path) for every partition file in range, oldest first.
+
+        A day can have both an archive and a plain file (e.g. compression was
+        interrupted or switched off); both are returned, archive first.
+        """
+        try:
+            names = os.listdir(self.partition_dir)
+        except OSError:
+            return []
+        found = []
+        for name in names:
+            match = _PARTITION_RE.match(name)
+            if not match:
+                continue
+            day = match.group(1)
+            if (start and day < start[:10]) or (end and day > end[:10]):
+                continue
+            found.append((day, not match.group(2), os.path.join(self.partition_dir, name)))
+        return [(day, path) for day, _, path in sorted(found)]
+
+    def _compress_closed(self):
+        """Moves the plain partitions of days before today into their gzip archives."""
+        today = date.today().isoformat()
+        if not LOG_PARTITION_COMPRESS or self._compressed_through == today:
+            return
+        for day, path in self._partitions():
+            if day >= today or _is_gzip(path):
+                continue
+            gz_path = self._path(day, compressed=True)
+            # Appended as a new gzip member so an existing archive for the day is kept.
+            with open(path, 'rb') as src, open(gz_path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+                    shutil.copyfileobj(src, gz)
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.remove(path)
+        self._compressed_through = today
+
+    def append(self, entry: dict):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        """Appends entries to their day's partition, one write and fsync per partition."""
+        by_day = {}
+        for entry in entries:
+            by_day.setdefault(self._day(entry), []).append(entry)
+        with self._lock:
+            os.makedirs(self.partition_dir, exist_ok=True)
+            self._compress_closed()
+            today = date.today().isoformat()
+            for day, day_entries in by_day.items():
+                gz_path = self._path(day, compressed=True)
+                closed = LOG_PARTITION_COMPRESS and day < today
+                _write_jsonl(gz_path if closed or os.path.exists(gz_path) else self._path(day), day_entries, mode='a')
+
+    def _entries(self, path: str, listed, reverse: bool = False):
+        reader = _read_jsonl_reverse if reverse else _read_jsonl
+        try:
+            yield from reader(path)
+        except FileNotFoundError:
+            # Compressed while we were reading it; if the archive is listed as
+            # well it is read on its own, so don't read it twice.
+            if not _is_gzip(path) and path + '.gz' not in listed:
+                yield from reader(path + '.gz')
+
+    def query(self, usernames=None, start: str | None = None, end: str | None = None, limit: int | None = None):
+        start, end = _normalize_bound(start), _normalize_bound(end)
+        wanted = set(usernames) if usernames is not None else None
+        if limit:
+            return self._tail(wanted, start, end, limit)
+        results = []
+        partitions = self._partitions(start, end)
+        listed = {path for _, path in partitions}
+        for _, path in partitions:
+            for entry in self._entries(path, listed):
+                if wanted is not None and entry.get('username') not in wanted:
+                    continue
+                ts = entry.get('timestamp') or ''
+                if (start and ts < start) or (end and ts > end):
+                    continue
+                results.append(entry)
+        return results
+
+    def _tail(self, wanted, start, end, limit):
+        results = []
+        partitions = self._partitions(start, end)
+        listed = {path for _, path in partitions}
+        for _, path in reversed(partitions):
+            for entry in self._entries(path, listed, reverse=True):
+                ts = entry.get('timestamp') or ''
+                if start and ts < start:
+                    # Entries are appended in time order and earlier days are
+                    # not listed, so everything from here on is older still.
+                    results.reverse()
+                    return results
+                if wanted is not None and entry.get('username') not in wanted:
+                    continue
+                if end and ts > end:
+                    continue
+                results.append(entry)
+                if len(results) >= limit:
+                    results.reverse()
+                    return results
+        results.reverse()
+        return results
+
+    def last_timestamp(self, username: str) -> str | None:
+        last = self._tail({username}, None, None, 1)
+        return last[0].get('timestamp') if last else None
+
+    def delete_user(self, username: str) -> int:
+        with self._lock:
+            removed = sum(_rewrite_jsonl_without(path, username) for _, path in self._partitions())
+            # The imported single-file log may still hold the user's history.
+            _rewrite_jsonl_without(self.log_file, username)
+        return removed
+
+    def marker(self):
+        """Changes whenever a partition changes; used to validate derived snapshots."""
+        stats = []
+        for _, path in self._partitions():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stats.append((stat.st_size, stat.st_mtime_ns))
+        if not stats:
+            return None
+        return [len(stats), sum(size for size, _ in stats), max(mtime for _, mtime in stats)]
+
+
+class SqliteInteractionStore:
+    """SQLite (WAL) store indexed on (username, timestamp).
+
+    The first time the database is created, existing entries from the JSONL
+    log are imported; after that all writes go to the database only.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, log_file: str, db_path: str | None = None):
+        self.log_file = log_file
+        self.db_path = db_path or os.path.splitext(log_file)[0] + '.sqlite3'
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        self._import_jsonl()
+
+    def _import_jsonl(self):
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM store_meta WHERE key = 'jsonl_imported'").fetchone():
+                return
+            rows = (self._row(entry) for entry in _read_jsonl(self.log_file))
+            self._conn.executemany('INSERT INTO interactions (username, timestamp, entry) VALUES (?, ?, ?)', rows)
+            self._conn.execute(
+                "INSERT INTO store_meta (key, value) VALUES ('jsonl_imported', ?)",
+                (datetime.now().isoformat(),)
+            )
+
+    @staticmethod
+    def _row(entry: dict):
+        return entry.get('username'), entry.get('timestamp'), json.dumps(entry, ensure_ascii=False)
+
+    def append(self, entry: dict):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        """Inserts entries in one transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT INTO interactions (username, timestamp, entry) VALUES (?, ?, ?)', [self._row(entry) for entry in entries])
+
+    def query(self, usernames=None, start: str | None = None, end: str | None = None, limit: int | None = None):
+        start, end = _normalize_bound(start), _normalize_bound(end)
+        clauses, params = [], []
+        if usernames is not None:
+            usernames = list(usernames)
+            if not usernames:
+                return []
+            clauses.append(f"username IN ({', '.join('?' * len(usernames))})")
+            params.extend(usernames)
+        if start:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end:
+            clauses.append('timestamp <= ?')
+            params.append(end)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        if limit:
+            # Newest `limit` rows through the index, returned oldest first.
+            sql = f'SELECT entry FROM (SELECT id, timestamp, entry FROM interactions {where} ORDER BY timestamp DESC, id DESC LIMIT ?) ORDER BY timestamp, id'
+            params.append(limit)
+        else:
+            sql = f'SELECT entry FROM interactions {where} ORDER BY timestamp, id'
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def last_timestamp(self, username: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute('SELECT MAX(timestamp) FROM interactions WHERE username = ?', (username,)).fetchone()
+        return row[0]
+
+    def delete_user(self, username: str) -> int:
+        with self._lock:
+            with self._conn:
+                removed = self._conn.execute('DELETE FROM interactions WHERE username = ?', (username,)).rowcount
+            # The imported JSONL may still hold the user's history.
+            _rewrite_jsonl_without(self.log_file, username)
+        return removed
+
+    def marker(self):
+        """Changes whenever rows are added or removed; used to validate derived snapshots."""
+        with self._lock:
+            return list(self._conn.execute('SELECT COUNT(*), MAX(id) FROM interactions').fetchone())
+
+
+def get_store(log_file: str, backend: str | None = None):
+    """Shared store for log_file, created on first use."""
+    backend = (backend or INTERACTION_STORE).lower()
+    key = (backend, os.path.abspath(log_file))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = SqliteInteractionStore(log_file) if backend == 'sqlite' else PartitionedJsonlStore(log_file)
+            _stores[key] = store
+        return store
@@ -64,11 +64,8 @@ def evaluate_rules() -> List[Dict]:
     rules = list_rules()
     if not rules:
         return []
-    if not os.path.exists(data_manager.LOG_FILE):
-        entries = []
-    else:
-        with open(data_manager.LOG_FILE, 'r', encoding='utf-8') as f:
-            entries = [json.loads(line) for line in f if line.strip()]
+    students = {student for rule in rules for student in rule['config'].get('students') or []}
+    entries = data_manager.interactions().query(students)
     for rule in rules:
         if rule['type'] == 'inactivity':
             alerts.extend(_check_inactivity(rule, entries))
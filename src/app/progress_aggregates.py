@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+from collections import Counter, deque
+
+# Updates between snapshots of the aggregates to disk.
+PROGRESS_SNAPSHOT_EVERY = int(os.environ.get('PROGRESS_SNAPSHOT_EVERY', '100'))
+# Most recent interactions per user served from memory.
+RECENT_WINDOW = int(os.environ.get('RECENT_WINDOW', '50'))
+TOP_WORDS = 3
+
+_aggregates = {}
+_aggregates_lock = threading.Lock()
+
+
+class _UserProgress:
+    def __init__(self, total=0, words=None, last_interaction=None):
+        self.total = total
+        self.words = Counter(words or {})
+        self.last_interaction = last_interaction
+
+    def add(self, entry: dict):
+        self.total += 1
+        self.words.update(item.get('word') for item in entry.get('processed_sentence') or [] if item.get('word'))
+        ts = entry.get('timestamp')
+        if ts and (self.last_interaction is None or ts > self.last_interaction):
+            self.last_interaction = ts
+
+    def summary(self):
+        return {
+            'total_interactions': self.total,
+            'most_common_words': self.words.most_common(TOP_WORDS),
+            'last_interaction': self.last_interaction
+        }
+
+    def to_dict(self):
+        return {'total': self.total, 'words': dict(self.words), 'last_interaction': self.last_interaction}
+
+
+class ProgressAggregates:
+    """Running per-user interaction count, word frequencies, last timestamp and recent window.
+
+    record() folds an entry in as soon as it is logged, before the background
+    logger has written it; append_many() is the logger's sink and only writes
+    to the store. A user's state is built from the store plus the entries not
+    yet written the first time it is asked for. Aggregates are snapshotted to
+    disk every PROGRESS_SNAPSHOT_EVERY updates together with the store's
+    marker; a snapshot whose marker no longer matches the store is ignored.
+    """
+
+    def __init__(self, store, snapshot_path: str | None = None):
+        self.store = store
+        self.snapshot_path = snapshot_path or os.path.splitext(store.log_file)[0] + '_progress.json'
+        # _lock guards the in-memory state only; _write_lock is held while the
+        # store is written or read to build a user's state, so a build sees
+        # each entry either in the store or in _unwritten, never both.
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        # Held from building a snapshot until it is on disk, so forget() cannot
+        # be overtaken by a snapshot that still holds the forgotten user.
+        self._snapshot_lock = threading.Lock()
+        self._users = {}
+        self._recent = {}
+        self._unwritten = {}
+        self._pending = 0
+        self._load_snapshot()
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get('marker') != self.store.marker():
+            return
+        self._users = {username: _UserProgress(**values) for username, values in data.get('users', {}).items()}
+
+    def snapshot(self):
+        with self._snapshot_lock:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        with self._write_lock, self._lock:
+            # Counts that include unwritten entries would not match the marker.
+            if not self._users or self._unwritten:
+                return False
+            data = {
+                'marker': self.store.marker(),
+                'users': {username: progress.to_dict() for username, progress in self._users.items()}
+            }
+            self._pending = 0
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+            return True
+        except OSError as e:
+            print(f"Error writing progress snapshot: {e}")
+            return False
+
+    def _unwritten_for(self, username: str):
+        return [entry for entry in self._unwritten.values() if entry.get('username') == username]
+
+    def _user(self, username: str) -> _UserProgress:
+        with self._lock:
+            progress = self._users.get(username)
+        if progress is not None:
+            return progress
+        with self._write_lock:
+            entries = self.store.query([username])
+            with self._lock:
+                progress = self._users.get(username)
+                if progress is None:
+                    progress = _UserProgress()
+                    for entry in entries + self._unwritten_for(username):
+                        progress.add(entry)
+                    self._users[username] = progress
+                return progress
+
+    def _recent_for(self, username: str) -> deque:
+        with self._lock:
+            recent = self._recent.get(username)
+        if recent is not None:
+            return recent
+        with self._write_lock:
+            entries = self.store.query([username], limit=RECENT_WINDOW)
+            with self._lock:
+                recent = self._recent.get(username)
+                if recent is None:
+                    recent = self._recent[username] = deque(entries + self._unwritten_for(username), maxlen=RECENT_WINDOW)
+                return recent
+
+    def record(self, entry: dict):
+        """Folds a just-logged entry into the loaded state of its user; no disk I/O."""
+        username = entry.get('username')
+        with self._lock:
+            self._unwritten[id(entry)] = entry
+            progress = self._users.get(username)
+            if progress is not None:
+                progress.add(entry)
+                self._pending += 1
+            recent = self._recent.get(username)
+            if recent is not None:
+                recent.append(entry)
+
+    def append_many(self, entries):
+        """Writes recorded entries to the store (called by the background logger)."""
+        with self._write_lock:
+            try:
+                self.store.append_many(entries)
+            finally:
+                with self._lock:
+                    for entry in entries:
+                        self._unwritten.pop(id(entry), None)
+                    due = self._pending >= PROGRESS_SNAPSHOT_EVERY
+        if due:
+            self.snapshot()
+
+    def summary(self, username: str):
+        progress = self._user(username)
+        with self._lock:
+            return progress.summary()
+
+    def recent(self, username: str, limit: int = 20):
+        """Last `limit` interactions of a user, oldest first."""
+        if limit > RECENT_WINDOW:
+            with self._write_lock:
+                entries = self.store.query([username], limit=limit)
+                with self._lock:
+                    return (entries + self._unwritten_for(username))[-limit:]
+        recent = self._recent_for(username)
+        with self._lock:
+            return list(recent)[-limit:]
+
+    def forget(self, username: str):
+        """Drops a user's state from memory and from the snapshot on disk."""
+        with self._snapshot_lock:
+            with self._lock:
+                self._users.pop(username, None)
+                self._recent.pop(username, None)
+            if self._write_snapshot():
+                return
+            # No snapshot could be written without the user; drop the old one
+            # so their counts do not stay on disk.
+            try:
+                os.remove(self.snapshot_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error removing progress snapshot: {e}")
+
+
+def for_store(store) -> ProgressAggregates:
+    """Shared aggregates for an interaction store."""
+    with _aggregates_lock:
+        aggregates = _aggregates.get(store)
+        if aggregates is None:
+            aggregates = _aggregates[store] = ProgressAggregates(store)
+        return aggregates
+
+
+def snapshot_all():
+    with _aggregates_lock:
+        aggregates = list(_aggregates.values())
+    for item in aggregates:
+        item.snapshot()
@@ -34,19 +34,7 @@ def _save_meta(items: List[Dict]):
 
 
 def _filter_logs(student_ids: Optional[List[str]], start: Optional[str], end: Optional[str]) -> List[Dict]:
-    if not os.path.exists(data_manager.LOG_FILE):
-        return []
-    with open(data_manager.LOG_FILE, 'r', encoding='utf-8') as f:
-        logs = [json.loads(line) for line in f if line.strip()]
-    if student_ids:
-        logs = [log for log in logs if log.get('username') in student_ids]
-    if start:
-        start_dt = datetime.fromisoformat(start)
-        logs = [log for log in logs if datetime.fromisoformat(log['timestamp']) >= start_dt]
-    if end:
-        end_dt = datetime.fromisoformat(end)
-        logs = [log for log in logs if datetime.fromisoformat(log['timestamp']) <= end_dt]
-    return logs
+    return data_manager.interactions(flush=True).query(student_ids or None, start, end)
 
 
 def generate_report(student_ids: Optional[List[str]] = None, start: Optional[str] = None, end: Optional[str] = None) -> Dict:
@@ -0,0 +1,139 @@
+import random
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import shutil
+
+import spacy
+from spacy.training import Example
+
+from src.model import intent_classifier, emotion_classifier, model_loader
+
+MODEL_DIR = Path('data/models/intent_emotion_textcat')
+INTENT_PIPE = 'textcat_intent'
+EMOTION_PIPE = 'textcat_emotion'
+DEFAULT_INTENT = ('otra_consulta', 0.0)
+DEFAULT_EMOTION = ('neutral', 0.0)
+# Fixed so every deployment trains the same model from the same data.
+TRAINING_SEED = 0
+
+
+def _examples(nlp, training_data, labels) -> List[Example]:
+    examples = []
+    for text, label in training_data:
+        cats = {lab: 0.0 for lab in labels}
+        cats[label] = 1.0
+        examples.append(Example.from_dict(nlp.make_doc(text), {'cats': cats}))
+    return examples
+
+
+def _train_model() -> spacy.language.Language:
+    spacy.util.fix_random_seed(TRAINING_SEED)
+    rng = random.Random(TRAINING_SEED)
+    nlp = spacy.blank('es')
+    # Two exclusive textcat heads behind one tokenizer; each keeps its own label set.
+    nlp.add_pipe('textcat', name=INTENT_PIPE)
+    nlp.add_pipe('textcat', name=EMOTION_PIPE)
+    nlp.config['initialize']['components'] = {
+        INTENT_PIPE: {'labels': intent_classifier.LABELS},
+        EMOTION_PIPE: {'labels': emotion_classifier.EMOTIONS}
+    }
+
+    intent_examples = _examples(nlp, intent_classifier.TRAINING_DATA, intent_classifier.LABELS)
+    emotion_examples = _examples(nlp, emotion_classifier.TRAINING_DATA, emotion_classifier.EMOTIONS)
+
+    optimizer = nlp.initialize(lambda: intent_examples + emotion_examples)
+    # Exclusive textcat treats absent labels as negatives, so each head only
+    # learns from its own examples.
+    for epoch in range(25):
+        rng.shuffle(intent_examples)
+        rng.shuffle(emotion_examples)
+        losses = {}
+        for batch in spacy.util.minibatch(intent_examples, size=4):
+            nlp.update(batch, sgd=optimizer, losses=losses, exclude=[EMOTION_PIPE])
+        for batch in spacy.util.minibatch(emotion_examples, size=3):
+            nlp.update(batch, sgd=optimizer, losses=losses, exclude=[INTENT_PIPE])
+
+    MODEL_DIR.parent.mkdir(parents=True, exist_ok=True)
+    nlp.to_disk(MODEL_DIR)
+    return nlp
+
+
+def _load_or_train() -> spacy.language.Language:
+    if MODEL_DIR.exists():
+        try:
+            return spacy.load(MODEL_DIR)
+        except Exception:
+            shutil.rmtree(MODEL_DIR, ignore_errors=True)
+    return _train_model()
+
+
+model_loader.register('intent_emotion', _load_or_train)
+
+
+def _ensure_model():
+    return model_loader.get('intent_emotion')
+
+
+def _best(cats: Dict[str, float], labels, default) -> Tuple[str, float]:
+    scores = {label: cats[label] for label in labels if label in cats}
+    if not scores:
+        return default
+    label = max(scores, key=scores.get)
+    return label, float(scores[label])
+
+
+def _distribution(doc) -> Dict[str, Dict[str, float]]:
+    return {
+        'intent': {label: float(doc.cats[label]) for label in intent_classifier.LABELS if label in doc.cats},
+        'emotion': {label: float(doc.cats[label]) for label in emotion_classifier.EMOTIONS if label in doc.cats}
+    }
+
+
+def _split(doc) -> Tuple[Tuple[str, float], Tuple[str, float]]:
+    intent = _best(doc.cats, intent_classifier.LABELS, DEFAULT_INTENT)
+    emotion = _best(doc.cats, emotion_classifier.EMOTIONS, DEFAULT_EMOTION)
+    return intent, emotion
+
+
+def predict_intent_emotion(text: str) -> Tuple[Tuple[str, float], Tuple[str, float]]:
+    """Returns (intent, score) and (emotion, score) from a single tokenization pass."""
+    if not text:
+        return DEFAULT_INTENT, DEFAULT_EMOTION
+    nlp = _ensure_model()
+    return _split(nlp(text.lower()))
+
+
+def predict_intent_emotion_batch(texts: Iterable[str], batch_size: int = 64) -> List[Tuple[Tuple[str, float], Tuple[str, float]]]:
+    """Scores many texts with nlp.pipe; empty texts get the default labels."""
+    texts = list(texts)
+    results = [(DEFAULT_INTENT, DEFAULT_EMOTION)] * len(texts)
+    positions = [i for i, text in enumerate(texts) if text]
+    if not positions:
+        return results
+    nlp = _ensure_model()
+    docs = nlp.pipe((texts[i].lower() for i in positions), batch_size=batch_size)
+    for i, doc in zip(positions, docs):
+        results[i] = _split(doc)
+    return results
+
+
+def intent_emotion_distribution(text: str) -> Dict[str, Dict[str, float]]:
+    """Full intent and emotion score distributions from one pass; empty text gets empty distributions."""
+    if not text:
+        return {'intent': {}, 'emotion': {}}
+    nlp = _ensure_model()
+    return _distribution(nlp(text.lower()))
+
+
+def intent_emotion_distribution_batch(texts: Iterable[str], batch_size: int = 64) -> List[Dict[str, Dict[str, float]]]:
+    """intent_emotion_distribution for many texts with nlp.pipe, e.g. to re-score usage logs offline."""
+    texts = list(texts)
+    results = [{'intent': {}, 'emotion': {}} for _ in texts]
+    positions = [i for i, text in enumerate(texts) if text]
+    if not positions:
+        return results
+    nlp = _ensure_model()
+    docs = nlp.pipe((texts[i].lower() for i in positions), batch_size=batch_size)
+    for i, doc in zip(positions, docs):
+        results[i] = _distribution(doc)
+    return results
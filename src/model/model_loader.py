@@ -0,0 +1,97 @@
+import threading
+import time
+
+
+class ComponentUnavailable(RuntimeError):
+    """Raised when a required component failed to load."""
+
+
+class _Component:
+    def __init__(self, name: str, loader, required: bool):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.state = 'pending'
+        self.value = None
+        self.error = None
+        self.load_ms = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        # Concurrent callers block on the lock until the first load finishes.
+        with self._lock:
+            if self.state in ('ready', 'failed'):
+                return
+            self.state = 'loading'
+            start = time.perf_counter()
+            try:
+                self.value = self.loader()
+                self.state = 'ready'
+            except Exception as exc:
+                self.error = f"{type(exc).__name__}: {exc}"
+                self.state = 'failed'
+            finally:
+                self.load_ms = int((time.perf_counter() - start) * 1000)
+
+
+_components = {}
+_background = None
+
+
+def register(name: str, loader, required: bool = True):
+    """Declares a lazily loaded component; registering a name twice keeps the first loader."""
+    return _components.setdefault(name, _Component(name, loader, required))
+
+
+def get(name: str, wait: bool = True):
+    """Returns the loaded component.
+
+    With wait=True the caller blocks until the component is loaded (loading it
+    inline if nobody has started it) and ComponentUnavailable is raised if it
+    failed. With wait=False, None is returned while a background load is
+    still pending or when loading failed, so callers can degrade.
+    """
+    component = _components[name]
+    if component.state != 'ready' and (wait or _background is None):
+        component.load()
+    if component.state == 'ready':
+        return component.value
+    if wait:
+        raise ComponentUnavailable(f"{name} failed to load: {component.error}")
+    return None
+
+
+def is_ready(name: str) -> bool:
+    component = _components.get(name)
+    return component is not None and component.state == 'ready'
+
+
+def start_background():
+    """Loads every registered component in a daemon thread, required ones first."""
+    global _background
+    if _background is not None:
+        return _background
+    ordered = sorted(_components.values(), key=lambda c: not c.required)
+
+    def _load_all():
+        for component in ordered:
+            component.load()
+
+    _background = threading.Thread(target=_load_all, name='model-loader', daemon=True)
+    _background.start()
+    return _background
+
+
+def status():
+    """Per-component state, load time and error, plus overall readiness of required components."""
+    components = {
+        name: {
+            'state': c.state,
+            'required': c.required,
+            'load_ms': c.load_ms,
+            'error': c.error
+        }
+        for name, c in _components.items()
+    }
+    ready = all(c.state == 'ready' for c in _components.values() if c.required)
+    return {'ready': ready, 'components': components}
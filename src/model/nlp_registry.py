@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+import spacy
+
+from src.model import model_loader
+
+DEFAULT_PIPELINE = "es_core_news_sm"
+
+# Components switched off per variant; None means tokenizer only.
+VARIANT_DISABLED = {
+    'full': (),
+    'tagger': ('parser', 'ner', 'lemmatizer'),
+    'lemmatizer': ('parser', 'ner'),
+    'ner': ('parser', 'lemmatizer', 'attribute_ruler', 'morphologizer'),
+    'tokenizer': None,
+}
+
+_lock = threading.Lock()
+_pipelines = {}
+_memory = {}
+_variants = {}
+
+
+def _rss_mb():
+    """Resident set size from /proc (Linux); None elsewhere."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class PipelineVariant:
+    """Callable view over a shared pipeline that skips the disabled components."""
+
+    def __init__(self, nlp, disabled):
+        self.nlp = nlp
+        self.disabled = None if disabled is None else [name for name in disabled if name in nlp.pipe_names]
+
+    @property
+    def pipe_names(self):
+        if self.disabled is None:
+            return []
+        return [name for name in self.nlp.pipe_names if name not in self.disabled]
+
+    def __call__(self, text: str):
+        if self.disabled is None:
+            return self.nlp.make_doc(text)
+        return self.nlp(text, disable=self.disabled)
+
+    def pipe(self, texts, **kwargs):
+        if self.disabled is None:
+            return (self.nlp.make_doc(text) for text in texts)
+        return self.nlp.pipe(texts, disable=self.disabled, **kwargs)
+
+
+def load(name: str = DEFAULT_PIPELINE):
+    """Loads a spaCy pipeline once per process and records what it cost."""
+    with _lock:
+        if name in _pipelines:
+            return _pipelines[name]
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        nlp = spacy.load(name)
+        rss_after = _rss_mb()
+        _memory[name] = {
+            'load_ms': int((time.perf_counter() - start) * 1000),
+            'rss_mb': round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+            'components': list(nlp.pipe_names)
+        }
+        _pipelines[name] = nlp
+        return nlp
+
+
+model_loader.register('spacy', lambda: load(DEFAULT_PIPELINE))
+
+
+def pipeline(variant: str = 'full', name: str = DEFAULT_PIPELINE) -> PipelineVariant:
+    """Shared pipeline `name` restricted to a variant from VARIANT_DISABLED."""
+    key = (name, variant)
+    cached = _variants.get(key)
+    if cached is None:
+        nlp = model_loader.get('spacy') if name == DEFAULT_PIPELINE else load(name)
+        cached = _variants.setdefault(key, PipelineVariant(nlp, VARIANT_DISABLED[variant]))
+    return cached
+
+
+def memory_report():
+    """Load time, RSS growth during load and components of every loaded pipeline."""
+    with _lock:
+        return {name: dict(info) for name, info in _memory.items()}
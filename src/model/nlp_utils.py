@@ -1,10 +1,17 @@
+import copy
+import hashlib
 import json
 import os
+import sys
 from unidecode import unidecode
-import spacy
 import re
+import unicodedata
+from functools import lru_cache
 import numpy as np
 
+from src.model import model_loader, nlp_registry
+from src.model.cache_utils import LRUCache
+
 try:
     from src.model import picto_encoder
 except Exception:  # pragma: no cover - optional
@@ -14,15 +21,102 @@ except Exception:  # pragma: no cover - optional
 def _normalize(text: str):
     return unidecode(text.lower().strip()) if text else ''
 
-nlp = spacy.load("es_core_news_sm")
+LEMMA_CACHE_SIZE = int(os.environ.get('LEMMA_CACHE_SIZE', '4096'))
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word: str) -> str:
+    """Returns the lemma of a single lowercase word, memoized across requests."""
+    # Single-word lemmas only need the tagger path; skip dependency parsing and NER.
+    doc = nlp_registry.pipeline('lemmatizer')(word)
+    return doc[0].lemma_ if len(doc) else word
+
+def lemma_cache_stats():
+    """Hit/miss counters for the shared lemma cache."""
+    info = lemmatize.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'hit_ratio': round(info.hits / lookups, 3) if lookups else 0.0
+    }
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(_SCRIPT_DIR, '../../data/raw/ARASAAC_ES')
+IMAGE_MANIFEST_PATH = os.path.join(_SCRIPT_DIR, '../../data/raw/arasaac_images_manifest.json')
+
+def _image_dir_signature(images_dir):
+    """Latest mtime of the image directory and its letter subdirectories."""
+    signature = os.stat(images_dir).st_mtime_ns
+    with os.scandir(images_dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                signature = max(signature, entry.stat().st_mtime_ns)
+    return signature
+
+def _scan_images(images_dir):
+    files = []
+    with os.scandir(images_dir) as letters:
+        for letter in letters:
+            if not letter.is_dir():
+                continue
+            with os.scandir(letter.path) as entries:
+                files.extend(os.path.join(letter.name, entry.name) for entry in entries if entry.is_file())
+    return files
+
+# macOS and Windows filesystems match names regardless of case (and, on macOS,
+# Unicode normalization); elsewhere a name only matches the exact file.
+_FOLD_IMAGE_NAMES = sys.platform in ('darwin', 'win32')
+
+def _image_key(path):
+    path = os.path.normpath(path)
+    if _FOLD_IMAGE_NAMES:
+        return unicodedata.normalize('NFC', path).casefold()
+    return path
+
+def _index_images(files):
+    return {_image_key(path): os.path.normpath(path) for path in files}
+
+def _load_image_set(images_dir=IMAGES_DIR, manifest_path=IMAGE_MANIFEST_PATH):
+    """Relative image paths by lookup key (see _image_key), read from the manifest unless the directory changed."""
+    try:
+        signature = _image_dir_signature(images_dir)
+    except OSError:
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('signature') == signature:
+            return _index_images(manifest.get('files', []))
+    except (OSError, ValueError):
+        pass
+
+    files = _scan_images(images_dir)
+    try:
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'signature': signature, 'files': files}, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+    except OSError:
+        pass
+    return _index_images(files)
+
+_IMAGE_SET = _load_image_set()
+
+def image_path(path):
+    """The on-disk relative path of a pictogram image, or None when it does not exist."""
+    if not path:
+        return None
+    return _IMAGE_SET.get(_image_key(path))
+
+def has_image(path) -> bool:
+    """True when the relative pictogram path exists under the image directory."""
+    return image_path(path) is not None
 
 def _load_pictograms():
-    """Loads pictograms from a JSON file and verifies their existence in an image directory."""
-    
-    # Construct the absolute paths
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    json_path = os.path.join(script_dir, '../../data/raw/arasaac_pictograms_es.json')
-    images_dir = os.path.join(script_dir, '../../data/raw/ARASAAC_ES')
+    """Loads pictograms from a JSON file and verifies their existence in the image manifest."""
+    json_path = os.path.join(_SCRIPT_DIR, '../../data/raw/arasaac_pictograms_es.json')
 
     with open(json_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
@@ -33,108 +127,329 @@ def _load_pictograms():
             keyword = keyword_entry.get('keyword')
             if keyword:
                 # Build the potential image path
-                relative_image_path = os.path.join(keyword[0].upper(), f"{keyword}.png")
-                image_path = os.path.join(images_dir, relative_image_path)
-                if os.path.exists(image_path):
+                relative_image_path = image_path(os.path.join(keyword[0].upper(), f"{keyword}.png"))
+                if relative_image_path:
+                    # Store the name as it is on disk, which may differ in case where names are folded.
                     pictogram_data['path'] = relative_image_path
                     loaded_pictograms.append(pictogram_data)
                     # Move to the next pictogram once a valid image is found for any of its keywords
                     break
     return loaded_pictograms
 
-pictograms = _load_pictograms()
+def _build_pic_index(pictograms_list):
+    """Precompute normalized keyword/tag sets for quick similarity lookup."""
+    pic_index = []
+    for pic in pictograms_list:
+        keywords = [kw.get('keyword') for kw in pic.get('keywords', []) if kw.get('keyword')]
+        tags = pic.get('tags', []) or []
+        norm_set = {_normalize(k) for k in keywords + tags if k}
+        pic_index.append({
+            'path': pic.get('path'),
+            'keywords': keywords,
+            'norm_set': norm_set,
+            'data': pic
+        })
+    return pic_index
+
+def _bm25_idf(doc_count, doc_freq):
+    return float(np.log(1.0 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5)))
 
-# Precompute normalized keyword/tag sets for quick similarity lookup
-_PIC_INDEX = []
-for pic in pictograms:
-    keywords = [kw.get('keyword') for kw in pic.get('keywords', []) if kw.get('keyword')]
-    tags = pic.get('tags', []) or []
-    norm_set = {_normalize(k) for k in keywords + tags if k}
-    _PIC_INDEX.append({
-        'path': pic.get('path'),
-        'keywords': keywords,
-        'norm_set': norm_set,
-        'data': pic
-    })
-
-_DENSE_INDEX = None
-_DENSE_EMB = None
-if picto_encoder is not None:
+def _build_token_index(pic_index):
+    """Inverted index from normalized token to _PIC_INDEX positions, with BM25 statistics."""
+    postings = {}
+    for position, entry in enumerate(pic_index):
+        for token in entry['norm_set']:
+            postings.setdefault(token, []).append(position)
+    doc_count = len(pic_index)
+    doc_len = [len(entry['norm_set']) for entry in pic_index]
+    avg_len = (sum(doc_len) / doc_count) if doc_count else 0.0
+    idf = {token: _bm25_idf(doc_count, len(ids)) for token, ids in postings.items()}
+    return {'postings': postings, 'idf': idf, 'doc_len': doc_len, 'avg_len': avg_len}
+
+def _build_dense(pictograms_list):
+    if picto_encoder is None:
+        return None, None, None
     try:
-        _DENSE_INDEX, _DENSE_EMB = picto_encoder.build_dense_index(pictograms)
+        dense_index, dense_emb = picto_encoder.build_dense_index(pictograms_list)
+        return dense_index, dense_emb, picto_encoder.build_ann_index(dense_emb)
     except Exception:
-        _DENSE_INDEX, _DENSE_EMB = None, None
+        return None, None, None
+
+def _build_keyword_index(pictograms_list):
+    """Maps exact and accent-folded keywords to the first pictogram that declares them."""
+    exact = {}
+    folded = {}
+    for pictogram in pictograms_list:
+        for keyword_entry in pictogram.get('keywords', []):
+            keyword = (keyword_entry.get('keyword') or '').lower()
+            exact.setdefault(keyword, pictogram)
+            folded.setdefault(unidecode(keyword), pictogram)
+    return {'exact': exact, 'unidecode': folded}
+
+def _build_tag_index(pictograms_list):
+    """Tag lookups for games and the category listing, plus an ETag for that listing."""
+    tags = set()
+    with_keywords = []
+    by_tag = {}
+    for pic in pictograms_list:
+        pic_tags = pic.get('tags') or []
+        tags.update(pic_tags)
+        if not pic.get('keywords'):
+            continue
+        with_keywords.append(pic)
+        for tag in pic_tags:
+            by_tag.setdefault(tag, []).append(pic)
+    categories = sorted(by_tag)
+    etag = hashlib.sha1(json.dumps(categories, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+    return {
+        'tags': tags,
+        'with_keywords': with_keywords,
+        'by_tag': by_tag,
+        'categories': categories,
+        'etag': f'"{etag}"'
+    }
+
+pictograms = _load_pictograms()
+_PIC_INDEX = _build_pic_index(pictograms)
+_TOKEN_INDEX = _build_token_index(_PIC_INDEX)
+# The dense index loads in the background (see load_dense_index); keyword overlap covers until then.
+_DENSE_INDEX, _DENSE_EMB, _ANN_INDEX = None, None, None
+_KEYWORD_INDEX = _build_keyword_index(pictograms)
+_TAG_INDEX = _build_tag_index(pictograms)
+# Bumped on every reload so callers can tell when derived data is stale.
+catalog_version = 0
+
+SUGGESTION_CACHE_SIZE = int(os.environ.get('SUGGESTION_CACHE_SIZE', '1024'))
+_SUGGESTION_CACHE = LRUCache(SUGGESTION_CACHE_SIZE)
+
+def reload_pictograms():
+    """Reloads the pictogram catalog, rebuilds every index and drops cached suggestions."""
+    global pictograms, _IMAGE_SET, _PIC_INDEX, _TOKEN_INDEX, _DENSE_INDEX, _DENSE_EMB, _ANN_INDEX, _KEYWORD_INDEX, _TAG_INDEX, catalog_version
+    _IMAGE_SET = _load_image_set()
+    new_pictograms = _load_pictograms()
+    pic_index = _build_pic_index(new_pictograms)
+    token_index = _build_token_index(pic_index)
+    dense = _build_dense(new_pictograms)
+    keyword_index = _build_keyword_index(new_pictograms)
+    tag_index = _build_tag_index(new_pictograms)
+    pictograms = new_pictograms
+    _PIC_INDEX = pic_index
+    _TOKEN_INDEX = token_index
+    _DENSE_INDEX, _DENSE_EMB, _ANN_INDEX = dense
+    _KEYWORD_INDEX = keyword_index
+    _TAG_INDEX = tag_index
+    catalog_version += 1
+    _SUGGESTION_CACHE.clear()
+    return len(pictograms)
+
+def load_dense_index():
+    """Builds the sentence-transformer index for the current catalog.
+
+    Raises when it cannot be built, so the loader reports the component as
+    failed; suggestions keep using the keyword ranking.
+    """
+    global _DENSE_INDEX, _DENSE_EMB, _ANN_INDEX
+    if picto_encoder is None:
+        raise RuntimeError("sentence-transformers is not installed")
+    dense_index, dense_emb = picto_encoder.build_dense_index(pictograms)
+    _DENSE_INDEX, _DENSE_EMB, _ANN_INDEX = dense_index, dense_emb, picto_encoder.build_ann_index(dense_emb)
+    _SUGGESTION_CACHE.clear()
+    if not _dense_available():
+        raise RuntimeError("dense pictogram index is empty")
+    return True
+
+model_loader.register('dense_index', load_dense_index, required=False)
+
+def dense_index(wait: bool = False):
+    """(entries, embeddings) of the dense index, or (None, None) when it is not available.
+
+    With wait=True the index is loaded first if the background loader has not done it yet.
+    """
+    model_loader.get('dense_index', wait=wait)
+    if not _dense_available():
+        return None, None
+    return _DENSE_INDEX, _DENSE_EMB
+
+def suggestion_cache_stats():
+    """Hit/miss counters for the suggest_pictograms result cache."""
+    return _SUGGESTION_CACHE.stats()
+
+def has_tag(tag) -> bool:
+    """True when any loaded pictogram carries the tag."""
+    return tag in _TAG_INDEX['tags']
+
+def pictograms_with_keywords(tag=None):
+    """Pictograms that have keywords, optionally restricted to one tag."""
+    if tag is None:
+        return _TAG_INDEX['with_keywords']
+    return _TAG_INDEX['by_tag'].get(tag, [])
+
+def category_listing():
+    """Sorted tags of pictograms with keywords, and the ETag for that list."""
+    return _TAG_INDEX['categories'], _TAG_INDEX['etag']
+
+def _keyword_index_for(pictograms_list):
+    if pictograms_list is pictograms:
+        return _KEYWORD_INDEX
+    return _build_keyword_index(pictograms_list)
 
 def find_pictogram(word, pictograms_list):
     """Finds a pictogram for the given word."""
+    index = _keyword_index_for(pictograms_list)
     word_lower = word.lower()
-    word_unidecode = unidecode(word_lower)
-    
+
     # 1. Exact match
-    for pictogram in pictograms_list:
-        for keyword_entry in pictogram.get('keywords', []):
-            if keyword_entry.get('keyword', '').lower() == word_lower:
-                return pictogram
+    pictogram = index['exact'].get(word_lower)
+    if pictogram is not None:
+        return pictogram
 
     # 2. Unidecode match
-    for pictogram in pictograms_list:
-        for keyword_entry in pictogram.get('keywords', []):
-            if unidecode(keyword_entry.get('keyword', '').lower()) == word_unidecode:
-                return pictogram
+    pictogram = index['unidecode'].get(unidecode(word_lower))
+    if pictogram is not None:
+        return pictogram
 
     # 3. Lemma match
-    doc = nlp(word_lower)
-    lemma = doc[0].lemma_
-    if lemma != word_lower:
-        for pictogram in pictograms_list:
-            for keyword_entry in pictogram.get('keywords', []):
-                if keyword_entry.get('keyword', '').lower() == lemma:
-                    return pictogram
+    lemma = lemmatize(word_lower)
+    if lemma == word_lower:
+        return None
+    pictogram = index['exact'].get(lemma)
+    if pictogram is not None:
+        return pictogram
 
     # 4. Unidecode lemma match
-    if lemma != word_lower:
-        unidecode_lemma = unidecode(lemma)
-        for pictogram in pictograms_list:
-            for keyword_entry in pictogram.get('keywords', []):
-                if unidecode(keyword_entry.get('keyword', '').lower()) == unidecode_lemma:
-                    return pictogram
+    return index['unidecode'].get(unidecode(lemma))
 
-    return None
 
+def _dense_available():
+    return _DENSE_INDEX is not None and _DENSE_EMB is not None and _DENSE_EMB.shape[0] > 0
 
-def suggest_pictograms(text: str, top_k: int = 5):
-    """Return top pictogram suggestions using dense embeddings when available; fallback to keyword overlap."""
-    if not text:
+
+# BM25 parameters; documents are keyword/tag sets, so term frequency is always 1.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def _keyword_suggestions(text: str, top_k: int):
+    """Keyword/tag overlap ranking used when dense embeddings are unavailable.
+
+    Only pictograms sharing a token with the query are scored, with BM25 so
+    that very common tags weigh less than rare ones. `score` is the BM25 value
+    divided by the best score the query could reach, so it stays in [0, 1].
+    """
+    tokens = re.findall(r"[\wáéíóúñü]+", text.lower())
+    norm_tokens = {_normalize(t) for t in tokens if t}
+    if not norm_tokens:
+        return []
+
+    postings = _TOKEN_INDEX['postings']
+    idf = _TOKEN_INDEX['idf']
+    doc_len = _TOKEN_INDEX['doc_len']
+    avg_len = _TOKEN_INDEX['avg_len'] or 1.0
+
+    matched = {}
+    for token in norm_tokens:
+        for position in postings.get(token, ()):
+            matched.setdefault(position, []).append(token)
+    if not matched:
         return []
 
-    # Try dense if built
-    if _DENSE_INDEX is not None and _DENSE_EMB is not None and _DENSE_EMB.shape[0] > 0:
+    # Best case per token: a one-token document. Tokens missing from the catalog
+    # count as the rarest possible token, so unmatched words lower the score.
+    rarest = _bm25_idf(len(_PIC_INDEX), 1)
+    max_score = sum(idf.get(token, rarest) for token in norm_tokens) * (BM25_K1 + 1) / (1 + BM25_K1 * (1 - BM25_B))
+
+    ranked = []
+    for position, overlap in matched.items():
+        entry = _PIC_INDEX[position]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[position] / avg_len)
+        score = sum(idf[token] * (BM25_K1 + 1) / (1 + norm) for token in overlap)
+        ranked.append((score, entry, overlap))
+
+    ranked.sort(key=lambda x: (-x[0], (x[1]['keywords'][0] if x[1]['keywords'] else '')))
+    return [{
+        'path': entry['path'],
+        'keyword': entry['keywords'][0] if entry['keywords'] else None,
+        'score': round(min(float(score / max_score), 1.0), 3),
+        'overlap': sorted(overlap)
+    } for score, entry, overlap in ranked[:top_k]]
+
+
+def _query_key(text: str) -> str:
+    # Only whitespace is collapsed: the encoder is case-sensitive, so case stays in the key.
+    return ' '.join(text.split()) or text
+
+
+def _copy_results(results):
+    # Callers may edit suggestions in place; never hand out the cached objects.
+    return copy.deepcopy(results)
+
+
+def _rank(text: str, top_k: int):
+    if _dense_available():
         try:
-            return picto_encoder.top_k(text, _DENSE_INDEX, _DENSE_EMB, k=top_k)
+            return picto_encoder.top_k(text, _DENSE_INDEX, _DENSE_EMB, k=top_k, ann_index=_ANN_INDEX)
         except Exception:
             pass
+    return _keyword_suggestions(text, top_k)
 
-    # Fallback: keyword/tag overlap
-    tokens = re.findall(r"[\wáéíóúñü]+", text.lower())
-    norm_tokens = {_normalize(t) for t in tokens if t}
-    if not norm_tokens:
+
+def suggest_pictograms(text: str, top_k: int = 5):
+    """Return top pictogram suggestions using dense embeddings when available; fallback to keyword overlap.
+
+    Results are cached per (whitespace-collapsed text, top_k) until the catalog
+    is reloaded; ranking always uses the text as given.
+    """
+    if not text:
         return []
 
-    scores = []
-    for entry in _PIC_INDEX:
-        overlap = norm_tokens & entry['norm_set']
-        if not overlap:
+    model_loader.get('dense_index', wait=False)
+    # Keyword-fallback results must not outlive the dense index becoming available.
+    key = (catalog_version, _dense_available(), _query_key(text), top_k)
+    cached = _SUGGESTION_CACHE.get(key)
+    if cached is None:
+        cached = _rank(text, top_k)
+        _SUGGESTION_CACHE.put(key, cached)
+    return _copy_results(cached)
+
+
+def suggest_pictograms_batch(texts, top_k: int = 5):
+    """suggest_pictograms for many texts at once; returns one result list per input text.
+
+    Only texts missing from the suggestion cache are encoded, in a single batch.
+    """
+    texts = list(texts)
+    model_loader.get('dense_index', wait=False)
+    key_prefix = (catalog_version, _dense_available())
+    results = [[] for _ in texts]
+    # Cache key -> (first text seen with that key, positions it answers).
+    pending = {}
+    for i, text in enumerate(texts):
+        if not text:
             continue
-        score = len(overlap) / max(len(norm_tokens), 1)
-        scores.append({
-            'path': entry['path'],
-            'keyword': entry['keywords'][0] if entry['keywords'] else None,
-            'score': round(score, 3),
-            'overlap': sorted(list(overlap))
-        })
+        query = _query_key(text)
+        cached = _SUGGESTION_CACHE.get((*key_prefix, query, top_k))
+        if cached is not None:
+            results[i] = _copy_results(cached)
+        else:
+            pending.setdefault(query, (text, []))[1].append(i)
+    if not pending:
+        return results
+
+    missing = [text for text, _ in pending.values()]
+    ranked = None
+    if _dense_available():
+        try:
+            ranked = picto_encoder.top_k_batch(missing, _DENSE_INDEX, _DENSE_EMB, k=top_k, ann_index=_ANN_INDEX)
+        except Exception:
+            ranked = None
+    if ranked is None:
+        ranked = [_keyword_suggestions(text, top_k) for text in missing]
+
+    for (query, (_, positions)), query_results in zip(pending.items(), ranked):
+        _SUGGESTION_CACHE.put((*key_prefix, query, top_k), query_results)
+        for i in positions:
+            results[i] = _copy_results(query_results)
+    return results
 
-    scores.sort(key=lambda x: (-x['score'], x.get('keyword') or ''))
-    return scores[:top_k]
 
 def find_word_for_pictogram(path, pictograms_list):
     """Finds the word for a given pictogram path."""
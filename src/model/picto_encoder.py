@@ -1,8 +1,18 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
 import numpy as np
 from functools import lru_cache
 from sentence_transformers import SentenceTransformer
 
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+CACHE_DIR = Path('data/models/picto_embeddings')
+# Approximate search only pays off on catalogs much larger than ARASAAC (~12k rows).
+ANN_MIN_ROWS = int(os.environ.get('PICTO_ANN_MIN_ROWS', '50000'))
+# Clusters scanned per query: higher means better recall and slower search.
+ANN_N_PROBE = int(os.environ.get('PICTO_ANN_NPROBE', '16'))
 
 
 @lru_cache(maxsize=1)
@@ -10,9 +20,7 @@ def _get_model():
     return SentenceTransformer(MODEL_NAME)
 
 
-def build_dense_index(pictograms):
-    """Build an in-memory dense index for pictograms using their first keyword."""
-    model = _get_model()
+def _collect_texts(pictograms):
     index = []
     texts = []
     for pic in pictograms:
@@ -24,25 +32,173 @@ def build_dense_index(pictograms):
             continue
         texts.append(keyword)
         index.append({"path": pic.get("path"), "keyword": keyword})
+    return index, texts
+
+
+def _cache_key(index) -> str:
+    """Hash of the encoder name and every (path, keyword) that gets embedded."""
+    digest = hashlib.sha256(MODEL_NAME.encode("utf-8"))
+    digest.update(json.dumps(index, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _load_cached(key: str, expected_rows: int):
+    emb_path = CACHE_DIR / f"{key}.npy"
+    if not emb_path.exists():
+        return None
+    try:
+        embeddings = np.load(emb_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if embeddings.ndim != 2 or embeddings.shape[0] != expected_rows:
+        return None
+    return embeddings
+
+
+def _save_cached(key: str, embeddings):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_DIR / f"{key}.tmp.npy"
+    np.save(tmp_path, np.asarray(embeddings, dtype=np.float32))
+    os.replace(tmp_path, CACHE_DIR / f"{key}.npy")
+    # Only the current catalog is worth keeping around.
+    for stale in CACHE_DIR.glob("*.npy"):
+        if stale.name != f"{key}.npy":
+            stale.unlink(missing_ok=True)
+
+
+def build_dense_index(pictograms, use_cache: bool = True):
+    """Build the dense index for pictograms using their first keyword.
+
+    Embeddings are persisted under CACHE_DIR keyed by catalog and model, and
+    later starts memory-map them instead of re-encoding.
+    """
+    index, texts = _collect_texts(pictograms)
     if not texts:
         return [], np.zeros((0, 384), dtype=np.float32)
+    key = _cache_key(index)
+    if use_cache:
+        cached = _load_cached(key, len(index))
+        if cached is not None:
+            return index, cached
+    model = _get_model()
     embeddings = model.encode(texts, normalize_embeddings=True)
+    if use_cache:
+        try:
+            _save_cached(key, embeddings)
+        except OSError:
+            pass
     return index, embeddings
 
 
-def top_k(text: str, index, embeddings, k: int = 5):
-    if not text or embeddings.shape[0] == 0:
-        return []
-    model = _get_model()
-    query = model.encode(text, normalize_embeddings=True)
-    scores = embeddings @ query
-    top_idx = np.argsort(-scores)[:k]
+def encode_query(text: str):
+    return _get_model().encode(text, normalize_embeddings=True)
+
+
+def _top_indices(scores, k: int):
+    """Indices of the k best scores, best first, without sorting the whole array."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class IVFIndex:
+    """Cluster-pruned (IVF) index over normalized embeddings.
+
+    Rows are grouped with spherical k-means; a query only scores the rows of
+    its n_probe closest clusters.
+    """
+
+    def __init__(self, embeddings, n_lists: int | None = None, n_iter: int = 10, seed: int = 0):
+        self.embeddings = embeddings
+        rows = embeddings.shape[0]
+        n_lists = n_lists or max(1, int(np.sqrt(rows)))
+        n_lists = min(n_lists, rows)
+        rng = np.random.default_rng(seed)
+        data = np.asarray(embeddings, dtype=np.float32)
+        centroids = data[rng.choice(rows, size=n_lists, replace=False)].copy()
+        assignment = np.zeros(rows, dtype=np.int64)
+        for _ in range(n_iter):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, data)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            if empty.any():
+                # Re-seed empty clusters so every list stays useful.
+                sums[empty] = data[rng.integers(rows, size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignment == c) for c in range(n_lists)]
+
+    def search(self, query, k: int = 5, n_probe: int | None = None):
+        """Returns (row indices, scores) of the approximate top-k, best first."""
+        n_probe = min(n_probe or ANN_N_PROBE, len(self.lists))
+        probed = _top_indices(self.centroids @ query, n_probe)
+        candidates = np.concatenate([self.lists[c] for c in probed])
+        if candidates.size == 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+        scores = self.embeddings[candidates] @ query
+        best = _top_indices(scores, k)
+        return candidates[best], scores[best]
+
+
+def build_ann_index(embeddings, min_rows: int | None = None):
+    """Builds an IVFIndex when the catalog is large enough to benefit from it."""
+    threshold = ANN_MIN_ROWS if min_rows is None else min_rows
+    if embeddings.shape[0] == 0 or embeddings.shape[0] < threshold:
+        return None
+    return IVFIndex(embeddings)
+
+
+def _format_results(index, top_idx, top_scores):
     results = []
-    for idx in top_idx:
+    for idx, score in zip(top_idx, top_scores):
         entry = index[int(idx)]
         results.append({
             "path": entry.get("path"),
             "keyword": entry.get("keyword"),
-            "score": float(scores[idx])
+            "score": float(score)
         })
     return results
+
+
+def top_k(text: str, index, embeddings, k: int = 5, ann_index: IVFIndex | None = None, n_probe: int | None = None):
+    if not text or embeddings.shape[0] == 0:
+        return []
+    query = encode_query(text)
+    if ann_index is not None:
+        top_idx, top_scores = ann_index.search(query, k, n_probe=n_probe)
+    else:
+        scores = embeddings @ query
+        top_idx = _top_indices(scores, k)
+        top_scores = scores[top_idx]
+    return _format_results(index, top_idx, top_scores)
+
+
+def top_k_batch(texts, index, embeddings, k: int = 5, ann_index: IVFIndex | None = None, n_probe: int | None = None, chunk_size: int = 256):
+    """top_k for many texts: one encoder forward pass and one matrix product per chunk."""
+    texts = list(texts)
+    results = [[] for _ in texts]
+    positions = [i for i, text in enumerate(texts) if text]
+    if not positions or embeddings.shape[0] == 0:
+        return results
+    queries = _get_model().encode([texts[i] for i in positions], normalize_embeddings=True)
+    queries = np.atleast_2d(queries)
+    if ann_index is not None:
+        for row, i in enumerate(positions):
+            top_idx, top_scores = ann_index.search(queries[row], k, n_probe=n_probe)
+            results[i] = _format_results(index, top_idx, top_scores)
+        return results
+    # Chunking bounds the (queries x pictograms) score matrix for large batches.
+    for start in range(0, len(positions), chunk_size):
+        scores = queries[start:start + chunk_size] @ embeddings.T
+        for offset, row_scores in enumerate(scores):
+            top_idx = _top_indices(row_scores, k)
+            results[positions[start + offset]] = _format_results(index, top_idx, row_scores[top_idx])
+    return results
@@ -0,0 +1,98 @@
+import os
+import threading
+from pathlib import Path
+
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSeq2SeqLM, TextIteratorStreamer
+
+T5_MODEL_NAME = "mrm8488/spanish-t5-small-sqac-for-qa"
+# Opt-in CPU int8 dynamic quantization of the Linear layers.
+T5_QUANTIZE = os.environ.get('T5_QUANTIZE', '').lower() in ('1', 'true', 'yes')
+# Seconds to wait for the next streamed piece before giving up on a generation.
+STREAM_TIMEOUT = float(os.environ.get('T5_STREAM_TIMEOUT', '60'))
+QUANTIZED_DIR = Path('data/models/t5_int8')
+
+
+def load_tokenizer():
+    return AutoTokenizer.from_pretrained(T5_MODEL_NAME)
+
+
+def load_fp32_model():
+    return AutoModelForSeq2SeqLM.from_pretrained(T5_MODEL_NAME)
+
+
+def quantize_model(model):
+    import torch
+
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _quantized_path() -> Path:
+    return QUANTIZED_DIR / f"{T5_MODEL_NAME.replace('/', '__')}.int8.state_dict.pt"
+
+
+def load_quantized_model():
+    """Loads the int8 weights saved by a previous run, converting and saving them on first use.
+
+    Only the state_dict is stored: the model is rebuilt from its config,
+    quantized the same way and then filled with weights_only loading, so the
+    artifact cannot execute code and does not pin the class layout.
+    """
+    import torch
+
+    path = _quantized_path()
+    if path.exists():
+        try:
+            model = quantize_model(AutoModelForSeq2SeqLM.from_config(AutoConfig.from_pretrained(T5_MODEL_NAME)))
+            model.load_state_dict(torch.load(path, weights_only=True))
+            model.eval()
+            return model
+        except Exception:
+            # Saved by an incompatible torch/transformers version; convert again.
+            path.unlink(missing_ok=True)
+    model = quantize_model(load_fp32_model())
+    try:
+        QUANTIZED_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        torch.save(model.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return model
+
+
+def load_model(quantize: bool | None = None):
+    """The T5 model used by the chatbot: fp32 by default, int8 when T5_QUANTIZE is set."""
+    quantize = T5_QUANTIZE if quantize is None else quantize
+    return load_quantized_model() if quantize else load_fp32_model()
+
+
+def stream_generate(tokenizer, model, prompt: str, on_text, max_input_length: int = 512, **generate_kwargs) -> str:
+    """Greedy/sampled generate that calls on_text with each decoded piece; returns the full text.
+
+    Streamers do not support beam search, so num_beams is forced to 1.
+    """
+    generate_kwargs = {k: v for k, v in generate_kwargs.items() if k not in ('early_stopping', 'num_return_sequences')}
+    generate_kwargs['num_beams'] = 1
+    inputs = tokenizer.encode(prompt, return_tensors="pt", max_length=max_input_length, truncation=True)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=STREAM_TIMEOUT)
+    errors = []
+
+    def _run():
+        try:
+            model.generate(inputs, streamer=streamer, **generate_kwargs)
+        except Exception as exc:
+            errors.append(exc)
+            streamer.end()
+
+    worker = threading.Thread(target=_run, name='t5-stream', daemon=True)
+    worker.start()
+    pieces = []
+    for piece in streamer:
+        if piece:
+            pieces.append(piece)
+            on_text(piece)
+    worker.join()
+    if errors:
+        raise errors[0]
+    return ''.join(pieces)
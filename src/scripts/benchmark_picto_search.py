@@ -0,0 +1,72 @@
+"""Compares exact and IVF pictogram search on the real ARASAAC embedding matrix.
+
+Usage: python -m src.scripts.benchmark_picto_search [--queries 200] [--k 5]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from src.model import model_loader, nlp_utils, picto_encoder
+
+SAMPLE_SENTENCES = [
+    "quiero agua",
+    "tengo hambre",
+    "vamos a jugar al parque",
+    "me duele la barriga",
+    "el perro come la comida",
+    "quiero ir al baño",
+    "estoy cansado",
+    "mi mamá está en casa",
+]
+
+
+def _queries(entries, n: int, seed: int):
+    random.seed(seed)
+    keywords = [entry['keyword'] for entry in entries if entry.get('keyword')]
+    texts = SAMPLE_SENTENCES + random.sample(keywords, k=min(n, len(keywords)))
+    return picto_encoder._get_model().encode(texts[:n], normalize_embeddings=True)
+
+
+def _time_per_query(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--lists', type=int, default=None, help='IVF clusters (default: sqrt(rows))')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        entries, embeddings = nlp_utils.dense_index(wait=True)
+    except model_loader.ComponentUnavailable as exc:
+        raise SystemExit(f"Dense index not available ({exc}); install sentence-transformers and the pictogram catalog.")
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    queries = _queries(entries, args.queries, args.seed)
+    print(f"Catalog rows: {embeddings.shape[0]}  queries: {len(queries)}  k: {args.k}")
+
+    argsort_ms, _ = _time_per_query(lambda q: np.argsort(-(embeddings @ q))[:args.k], queries)
+    exact_ms, exact = _time_per_query(lambda q: picto_encoder._top_indices(embeddings @ q, args.k), queries)
+    print(f"{'full argsort':<18}{argsort_ms:8.3f} ms/query  recall@{args.k} 1.000")
+    print(f"{'argpartition':<18}{exact_ms:8.3f} ms/query  recall@{args.k} 1.000")
+
+    start = time.perf_counter()
+    ivf = picto_encoder.IVFIndex(embeddings, n_lists=args.lists, seed=args.seed)
+    print(f"IVF build: {len(ivf.lists)} lists in {time.perf_counter() - start:.2f} s")
+    for n_probe in (1, 2, 4, 8, 16, 32):
+        if n_probe > len(ivf.lists):
+            break
+        ivf_ms, approx = _time_per_query(lambda q: ivf.search(q, args.k, n_probe=n_probe)[0], queries)
+        hits = sum(len(set(a.tolist()) & set(e.tolist())) for a, e in zip(approx, exact))
+        recall = hits / sum(len(e) for e in exact)
+        print(f"{'ivf n_probe=' + str(n_probe):<18}{ivf_ms:8.3f} ms/query  recall@{args.k} {recall:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Compares the fp32 and int8 (dynamic quantization) spanish-t5 models on CPU.
+
+Reports load time, resident memory added by each model, per-prompt latency
+and how often the int8 output matches the fp32 output.
+
+Usage: python -m src.scripts.benchmark_t5_quantization [--runs 3] [--num-beams 4] [--max-length 60]
+"""
+import argparse
+import difflib
+import gc
+import os
+import statistics
+import time
+
+from src.model import t5_model
+
+PROMPTS = [
+    "Eres un tutor AAC. Da una pista breve sin revelar la palabra completa. Letra inicial: PE. Máximo 12 palabras.",
+    "Eres un tutor AAC. Genera un refuerzo breve en español para un niño que acertó una palabra. Palabra: agua. Sé cálido y usa menos de 15 palabras.",
+    "Eres un tutor AAC. Felicita en español a un niño por terminar una sesión guiada. Usa menos de 18 palabras y tono alegre.",
+    "Eres un tutor AAC en español. En 18 palabras, valida la emoción y da 2 micro-acciones para regularse. Emoción: triste.",
+    "Eres un tutor AAC en español. Responde en 18 palabras. Petición: ir al baño.",
+    "Eres un tutor de comunicación aumentativa que responde en español claro y breve. Usuario: quiero jugar en el parque",
+    "Eres un tutor de comunicación aumentativa que responde en español claro y breve. Usuario: qué es un perro",
+    "Eres un tutor de comunicación aumentativa que responde en español claro y breve. Usuario: tengo hambre",
+]
+
+
+def _rss_mb():
+    """Resident set size from /proc (Linux); NaN elsewhere."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return float('nan')
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def _run(model, tokenizer, args):
+    outputs = []
+    latencies = []
+    for prompt in PROMPTS:
+        inputs = tokenizer.encode(prompt, return_tensors="pt", max_length=256, truncation=True)
+        per_prompt = []
+        text = ""
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            generated = model.generate(inputs, max_length=args.max_length, num_beams=args.num_beams, early_stopping=args.num_beams > 1)
+            per_prompt.append((time.perf_counter() - start) * 1000)
+            text = tokenizer.decode(generated[0], skip_special_tokens=True)
+        latencies.append(statistics.median(per_prompt))
+        outputs.append(text)
+    return outputs, latencies
+
+
+def _measure(label, loader, tokenizer, args):
+    gc.collect()
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    model = loader()
+    load_s = time.perf_counter() - start
+    rss_delta = _rss_mb() - rss_before
+    outputs, latencies = _run(model, tokenizer, args)
+    print(f"{label:<6} load {load_s:6.2f} s  +RSS {rss_delta:7.1f} MB  "
+          f"median {statistics.median(latencies):8.1f} ms/prompt  total {sum(latencies):8.1f} ms")
+    del model
+    gc.collect()
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=3, help='timed generations per prompt')
+    parser.add_argument('--num-beams', type=int, default=4)
+    parser.add_argument('--max-length', type=int, default=60)
+    args = parser.parse_args()
+
+    tokenizer = t5_model.load_tokenizer()
+    print(f"Model: {t5_model.T5_MODEL_NAME}  prompts: {len(PROMPTS)}  runs: {args.runs}  beams: {args.num_beams}")
+    fp32 = _measure('fp32', t5_model.load_fp32_model, tokenizer, args)
+    int8 = _measure('int8', t5_model.load_quantized_model, tokenizer, args)
+
+    exact = sum(a == b for a, b in zip(fp32, int8))
+    similarity = statistics.mean(difflib.SequenceMatcher(None, a.split(), b.split()).ratio() for a, b in zip(fp32, int8))
+    print(f"Agreement: {exact}/{len(PROMPTS)} identical outputs, mean token similarity {similarity:.3f}")
+    for prompt, a, b in zip(PROMPTS, fp32, int8):
+        if a != b:
+            print(f"- {prompt[-40:]!r}\n  fp32: {a}\n  int8: {b}")
+
+
+if __name__ == '__main__':
+    main()
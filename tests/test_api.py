@@ -25,11 +25,26 @@ def test_read_root():
     # The root now redirects, so we expect a 200 OK and the content of index.html
     assert "text/html" in response.headers["content-type"]
 
+def test_healthz_reports_components():
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    components = response.json()["components"]
+    assert "spacy" in components
+    assert components["t5"]["required"] is False
+
 def test_get_pictograms():
     response = client.get("/pictograms")
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
+def test_categories_etag():
+    response = client.get("/categories")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+    etag = response.headers["etag"]
+    cached = client.get("/categories", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
 def test_process_sentence():
     response = client.post("/process", json={"text": "hola"})
     assert response.status_code == 200
@@ -37,6 +52,16 @@ def test_process_sentence():
     assert "processed_sentence" in data
     assert isinstance(data["processed_sentence"], list)
 
+def test_process_stream_websocket(monkeypatch):
+    monkeypatch.setattr(auth, "user_from_token", lambda token: override_student_user() if token == "valid" else None)
+    with client.websocket_connect("/ws/process?token=valid") as websocket:
+        websocket.send_json({"text": "hola"})
+        event = websocket.receive_json()
+        while event["type"] not in ("done", "error"):
+            event = websocket.receive_json()
+    assert event["type"] == "done"
+    assert isinstance(event["processed_sentence"], list)
+
 def test_pictogram_to_text():
     # First, get a valid pictogram path from the gallery
     response = client.get("/pictograms")
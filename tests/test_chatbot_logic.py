@@ -1,11 +1,14 @@
 import unittest
+from unittest import mock
 import sys
 import os
+import unicodedata
 
 # Add the src directory to the Python path to allow imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.model.nlp_utils import find_pictogram
+from src.model import nlp_utils, intent_emotion_classifier
+from src.model.nlp_utils import find_pictogram, lemmatize, lemma_cache_stats
 
 class TestChatbotLogic(unittest.TestCase):
 
@@ -33,6 +36,100 @@ class TestChatbotLogic(unittest.TestCase):
         # Test case sensitivity (should be handled by the caller)
         self.assertIsNotNone(find_pictogram("Gato", self.dummy_pictograms))
 
+    def test_find_pictogram_accent_folding(self):
+        """Accent-folded lookups resolve to the same pictogram as the exact keyword."""
+        self.assertEqual(find_pictogram("adios", self.dummy_pictograms)["_id"], 2)
+        self.assertEqual(find_pictogram("ADIÓS", self.dummy_pictograms)["_id"], 2)
+
+    def test_lemma_cache_counts_repeated_words(self):
+        """Repeated words are served from the lemma cache."""
+        lemmatize.cache_clear()
+        first = lemmatize("comer")
+        self.assertEqual(lemmatize("comer"), first)
+        stats = lemma_cache_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_suggestion_cache_serves_repeated_phrases(self):
+        """Repeated phrases hit the suggestion cache and return independent copies."""
+        nlp_utils._SUGGESTION_CACHE.clear()
+        first = nlp_utils.suggest_pictograms("quiero agua", top_k=3)
+        for item in first:
+            item["score"] = -1
+        second = nlp_utils.suggest_pictograms("  quiero   agua ", top_k=3)
+        self.assertTrue(all(item["score"] != -1 for item in second))
+        stats = nlp_utils.suggestion_cache_stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_intent_emotion_batch_matches_single_predictions(self):
+        """Batch scoring gives the same labels as scoring each text on its own."""
+        class FakeDoc:
+            def __init__(self, text):
+                self.cats = {
+                    "terapia_habla": 0.9 if "hola" in text else 0.1,
+                    "otra_consulta": 0.5,
+                    "orgulloso": 0.8 if "feliz" in text else 0.2,
+                    "neutral": 0.4
+                }
+
+        class FakeNlp:
+            def __call__(self, text):
+                return FakeDoc(text)
+
+            def pipe(self, texts, batch_size=64):
+                return (FakeDoc(text) for text in texts)
+
+        texts = ["Hola", "", "estoy feliz", "quiero agua"]
+        with mock.patch.object(intent_emotion_classifier, "_ensure_model", return_value=FakeNlp()):
+            batch = intent_emotion_classifier.predict_intent_emotion_batch(texts, batch_size=2)
+            single = [intent_emotion_classifier.predict_intent_emotion(text) for text in texts]
+            distributions = intent_emotion_classifier.intent_emotion_distribution_batch(texts, batch_size=2)
+            single_distributions = [intent_emotion_classifier.intent_emotion_distribution(text) for text in texts]
+        self.assertEqual(batch, single)
+        self.assertEqual(distributions, single_distributions)
+        self.assertEqual(distributions[0]["intent"], {"terapia_habla": 0.9, "otra_consulta": 0.5})
+        self.assertEqual(distributions[2]["emotion"], {"orgulloso": 0.8, "neutral": 0.4})
+        self.assertEqual(batch[1], (intent_emotion_classifier.DEFAULT_INTENT, intent_emotion_classifier.DEFAULT_EMOTION))
+
+    def test_image_lookup_matches_exact_names_unless_folded(self):
+        """Image names match exactly; folded lookups resolve to the name on disk."""
+        files = ["G/Georgia.png", "P/Papá Noel_3.png"]
+        with mock.patch.object(nlp_utils, "_FOLD_IMAGE_NAMES", False):
+            with mock.patch.object(nlp_utils, "_IMAGE_SET", nlp_utils._index_images(files)):
+                self.assertTrue(nlp_utils.has_image("G/Georgia.png"))
+                self.assertFalse(nlp_utils.has_image("G/georgia.png"))
+        with mock.patch.object(nlp_utils, "_FOLD_IMAGE_NAMES", True):
+            with mock.patch.object(nlp_utils, "_IMAGE_SET", nlp_utils._index_images(files)):
+                self.assertEqual(nlp_utils.image_path("G/georgia.png"), "G/Georgia.png")
+                nfd_name = unicodedata.normalize("NFD", "P/papá noel_3.png")
+                self.assertEqual(nlp_utils.image_path(nfd_name), "P/Papá Noel_3.png")
+
+    def test_keyword_suggestions_rank_rare_tokens_with_bounded_scores(self):
+        """BM25 ranks rarer and fuller matches first and reports scores in [0, 1]."""
+        pictograms = [
+            {"path": "P/perro.png", "keywords": [{"keyword": "perro"}], "tags": ["animal"]},
+            {"path": "G/gato.png", "keywords": [{"keyword": "gato"}], "tags": ["animal"]},
+            {"path": "V/vaca.png", "keywords": [{"keyword": "vaca"}], "tags": ["animal"]},
+            {"path": "P/perro grande.png", "keywords": [{"keyword": "perro"}, {"keyword": "grande"}], "tags": ["animal"]}
+        ]
+        pic_index = nlp_utils._build_pic_index(pictograms)
+        with mock.patch.object(nlp_utils, "_PIC_INDEX", pic_index), \
+                mock.patch.object(nlp_utils, "_TOKEN_INDEX", nlp_utils._build_token_index(pic_index)):
+            results = nlp_utils._keyword_suggestions("perro grande", top_k=5)
+            self.assertEqual(results[0]["path"], "P/perro grande.png")
+            self.assertEqual(results[1]["path"], "P/perro.png")
+            common = nlp_utils._keyword_suggestions("animal", top_k=5)
+            unknown = nlp_utils._keyword_suggestions("perro xyz", top_k=5)
+        self.assertEqual(len(common), 4)
+        for item in results + common + unknown:
+            self.assertGreaterEqual(item["score"], 0.0)
+            self.assertLessEqual(item["score"], 1.0)
+        perro_alone = next(item for item in results if item["path"] == "P/perro.png")
+        perro_unknown = next(item for item in unknown if item["path"] == "P/perro.png")
+        self.assertLess(perro_unknown["score"], 1.0)
+        self.assertGreater(results[0]["score"], perro_alone["score"])
+
 
 if __name__ == '__main__':
     unittest.main()
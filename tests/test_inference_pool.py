@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.app import inference_pool
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_timeout_raises_and_late_job_is_not_completed():
+    pool = inference_pool.InferencePool(max_workers=1, timeout_s=0.05)
+    release = threading.Event()
+
+    async def timed_out_then_queued():
+        with pytest.raises(inference_pool.InferenceTimeout):
+            await pool.run(release.wait)
+        # The only worker is still busy, so this job times out while queued and is dropped.
+        with pytest.raises(inference_pool.InferenceTimeout):
+            await pool.run(lambda: "late")
+        assert pool.stats()["queue_depth"] == 0
+
+    asyncio.run(timed_out_then_queued())
+    release.set()
+    _wait_for(lambda: pool.stats()["running"] == 0)
+    stats = pool.stats()
+    assert stats["timeouts"] == 2
+    assert stats["completed"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_serial_key_waits_outside_the_workers():
+    pool = inference_pool.InferencePool(max_workers=2, timeout_s=2)
+    release = threading.Event()
+    order = []
+
+    def turn(name, block=False):
+        if block:
+            release.wait()
+        order.append(name)
+        return name
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run(turn, "ana-1", True, serial_key="ana"))
+        second = asyncio.ensure_future(pool.run(turn, "ana-2", serial_key="ana"))
+        await asyncio.sleep(0.05)
+        # ana-2 waits for ana-1 without holding the second worker.
+        assert pool.stats()["running"] == 1
+        assert pool.stats()["queue_depth"] == 1
+        assert await pool.run(turn, "luis-1", serial_key="luis") == "luis-1"
+        release.set()
+        return await first, await second
+
+    assert asyncio.run(scenario()) == ("ana-1", "ana-2")
+    assert order == ["luis-1", "ana-1", "ana-2"]
+    stats = pool.stats()
+    assert stats["completed"] == 3
+    assert stats["queue_depth"] == 0
+
+
+def test_serial_key_holds_next_turn_until_timed_out_job_finishes():
+    pool = inference_pool.InferencePool(max_workers=2, timeout_s=0.05)
+    release = threading.Event()
+    order = []
+
+    def turn(name, block=False):
+        if block:
+            release.wait()
+        order.append(name)
+        return name
+
+    async def scenario():
+        with pytest.raises(inference_pool.InferenceTimeout):
+            await pool.run(turn, "ana-1", True, serial_key="ana")
+        # ana-1 is still running, so ana-2 times out waiting for it instead of running alongside.
+        with pytest.raises(inference_pool.InferenceTimeout):
+            await pool.run(turn, "ana-2", serial_key="ana")
+        assert pool.stats()["queue_depth"] == 0
+        release.set()
+        return await pool.run(turn, "ana-3", serial_key="ana", timeout=2)
+
+    assert asyncio.run(scenario()) == "ana-3"
+    assert order == ["ana-1", "ana-3"]
+    stats = pool.stats()
+    assert stats["timeouts"] == 2
+    assert stats["completed"] == 1
+    assert stats["queue_depth"] == 0
@@ -47,3 +47,154 @@ def test_get_user_progress_summary_counts_words(tmp_path, monkeypatch):
     assert summary['most_common_words'][0][0] == 'hola'
     assert summary['most_common_words'][0][1] == 2
     assert summary['last_interaction'] == "2025-01-02T12:00:00"
+
+
+def test_interaction_store_imports_jsonl_and_filters(tmp_path, monkeypatch):
+    log_file = tmp_path / "usage_logs.json"
+    with open(log_file, "w", encoding="utf-8") as f:
+        for day, user in [(1, "ana"), (2, "luis"), (3, "ana"), (4, "ana")]:
+            f.write(json.dumps({"timestamp": f"2025-01-0{day}T09:00:00", "username": user, "processed_sentence": []}) + "\n")
+    monkeypatch.setattr(data_manager, "LOG_FILE", str(log_file))
+
+    store = data_manager.interactions()
+    assert [e["timestamp"][:10] for e in store.query(["ana"], limit=2)] == ["2025-01-03", "2025-01-04"]
+    assert len(store.query(start="2025-01-02", end="2025-01-03T23:59:59")) == 2
+
+    data_manager.log_interaction("luis", "hola", [{"word": "hola"}])
+    assert data_manager.get_user_progress_summary("luis")["total_interactions"] == 2
+
+    store.delete_user("ana")
+    assert store.query(["ana"]) == []
+    assert all(json.loads(line)["username"] != "ana" for line in log_file.read_text().splitlines())
+
+
+def test_progress_summary_updates_incrementally(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_manager, "LOG_FILE", str(tmp_path / "usage_logs.json"))
+
+    data_manager.log_interaction("ana", "hola", [{"word": "hola"}])
+    assert data_manager.get_user_progress_summary("ana")["total_interactions"] == 1
+
+    data_manager.log_interaction("ana", "hola mamá", [{"word": "hola"}, {"word": "mamá"}])
+    summary = data_manager.get_user_progress_summary("ana")
+    assert summary["total_interactions"] == 2
+    assert summary["most_common_words"][0] == ("hola", 2)
+    assert [e["sentence"] for e in data_manager.get_recent_interactions("ana", limit=5)] == ["hola", "hola mamá"]
+
+
+
+def test_delete_interactions_removes_user_from_progress_snapshot(tmp_path, monkeypatch):
+    from src.app import interaction_logger, progress_aggregates
+
+    monkeypatch.setattr(data_manager, "LOG_FILE", str(tmp_path / "usage_logs.json"))
+    data_manager.log_interaction("ana", "secreto", [{"word": "secreto"}])
+    data_manager.log_interaction("luis", "hola", [{"word": "hola"}])
+    assert data_manager.get_user_progress_summary("ana")["total_interactions"] == 1
+    assert data_manager.get_user_progress_summary("luis")["total_interactions"] == 1
+    interaction_logger.logger.flush()
+    progress_aggregates.snapshot_all()
+    snapshot_file = tmp_path / "usage_logs_progress.json"
+    assert "ana" in json.loads(snapshot_file.read_text(encoding="utf-8"))["users"]
+
+    data_manager.delete_interactions("ana")
+    users = json.loads(snapshot_file.read_text(encoding="utf-8"))["users"]
+    assert "ana" not in users and "secreto" not in snapshot_file.read_text(encoding="utf-8")
+    assert users["luis"]["total"] == 1
+
+    data_manager.delete_interactions("luis")
+    assert not snapshot_file.exists()
+
+
+def test_partitioned_store_compresses_past_days(tmp_path):
+    from src.app import interaction_store
+
+    store = interaction_store.PartitionedJsonlStore(str(tmp_path / "usage_logs.json"))
+    store.append_many([
+        {"timestamp": "2025-01-01T10:00:00", "username": "ana"},
+        {"timestamp": "2025-01-02T10:00:00", "username": "ana"},
+    ])
+    store.append({"timestamp": "2025-01-01T18:00:00", "username": "luis"})
+
+    assert sorted(p.name for p in (tmp_path / "usage_logs").glob("*.jsonl*")) == ["2025-01-01.jsonl.gz", "2025-01-02.jsonl.gz"]
+    assert [e["username"] for e in store.query(start="2025-01-01", end="2025-01-01T23:59:59")] == ["ana", "luis"]
+    assert store.query(["ana"], limit=1)[0]["timestamp"] == "2025-01-02T10:00:00"
+
+
+def test_partitioned_store_keeps_archive_when_compressing_late_plain_file(tmp_path):
+    from src.app import interaction_store
+
+    log_file = str(tmp_path / "usage_logs.json")
+    store = interaction_store.PartitionedJsonlStore(log_file)
+    store.append({"timestamp": "2025-01-01T10:00:00", "username": "ana"})
+    # Left behind e.g. by a restart with compression switched off.
+    (tmp_path / "usage_logs" / "2025-01-01.jsonl").write_text(json.dumps({"timestamp": "2025-01-01T12:00:00", "username": "luis"}) + "\n")
+    assert [e["username"] for e in store.query()] == ["ana", "luis"]
+
+    reopened = interaction_store.PartitionedJsonlStore(log_file)
+    reopened.append({"timestamp": "2025-01-02T10:00:00", "username": "ana"})
+    assert not (tmp_path / "usage_logs" / "2025-01-01.jsonl").exists()
+    assert [e["username"] for e in reopened.query(end="2025-01-01T23:59:59")] == ["ana", "luis"]
+
+
+def test_reverse_reader_handles_block_boundaries(tmp_path):
+    from src.app import interaction_store
+
+    entries = [{"username": "ana", "sentence": "ñandú " * i} for i in range(12)]
+    log_file = tmp_path / "usage.jsonl"
+    log_file.write_text("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).rstrip("\n"), encoding="utf-8")
+
+    # Small blocks split lines (and multi-byte characters) across reads; no trailing newline.
+    assert list(interaction_store._read_jsonl_reverse(str(log_file), block_size=7)) == entries[::-1]
+
+    empty = tmp_path / "empty.jsonl"
+    empty.write_text("")
+    assert list(interaction_store._read_jsonl_reverse(str(empty), block_size=7)) == []
+
+
+def test_tail_query_with_limit_larger_than_log(tmp_path):
+    from src.app import interaction_store
+
+    store = interaction_store.PartitionedJsonlStore(str(tmp_path / "usage_logs.json"))
+    assert store.query(["ana"], limit=10) == []
+    store.append_many([
+        {"timestamp": "2025-01-01T10:00:00", "username": "ana"},
+        {"timestamp": "2025-01-01T11:00:00", "username": "luis"},
+        {"timestamp": "2025-01-02T10:00:00", "username": "ana"},
+    ])
+    assert [e["timestamp"] for e in store.query(["ana"], limit=10)] == ["2025-01-01T10:00:00", "2025-01-02T10:00:00"]
+    assert len(store.query(limit=100)) == 3
+
+
+def test_tail_query_stops_at_first_entry_before_start(tmp_path, monkeypatch):
+    from src.app import interaction_store
+
+    store = interaction_store.PartitionedJsonlStore(str(tmp_path / "usage_logs.json"))
+    store.append_many([{"timestamp": f"2025-01-01T{hour:02d}:00:00", "username": "ana"} for hour in range(10)])
+    read = []
+    reverse_reader = interaction_store._read_jsonl_reverse
+
+    def counting_reader(path, *args, **kwargs):
+        for entry in reverse_reader(path, *args, **kwargs):
+            read.append(entry)
+            yield entry
+
+    monkeypatch.setattr(interaction_store, "_read_jsonl_reverse", counting_reader)
+    results = store.query(["ana"], start="2025-01-01T07:00:00", limit=10)
+    assert [e["timestamp"][11:13] for e in results] == ["07", "08", "09"]
+    assert len(read) == 4
+
+
+def test_audit_entries_are_written_by_the_background_logger(tmp_path, monkeypatch):
+    from src.app import consent_manager, interaction_logger, interaction_store
+
+    audit_log = str(tmp_path / "audit_logs.json")
+    logger = interaction_logger.BufferedLogger(batch_size=64, flush_interval_ms=60000)
+    monkeypatch.setattr(consent_manager, "AUDIT_LOG", audit_log)
+    monkeypatch.setattr(interaction_logger, "logger", logger)
+
+    consent_manager.log_audit("chatbot_consent_request", "ana", metadata={"text": "puedo salir"})
+    store = interaction_store.get_store(audit_log, backend="jsonl")
+    assert store.query() == []
+    assert logger.stats()["queue_depth"] == 1
+
+    logger.flush()
+    assert [e["action"] for e in store.query()] == ["chatbot_consent_request"]